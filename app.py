@@ -1,9 +1,18 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import numpy as np
 
+from lazy_imports import lazy_import
+from columnar_store import load_frame
+from matrix_store import MatrixStore
+from pillar_weights import ALV_BURST_WEIGHT, PILLAR_WEIGHTS
+from rollup_cube import cube_key, load_cube
+from simulator import WhatIfSimulator
+
+# Plotly loads on the first chart, not on every cold start
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
+
 # ==========================================
 # 1. DESIGN SYSTEM & CONFIGURATION
 # ==========================================
@@ -23,6 +32,7 @@ def reset_simulation():
 if 'sim_neev' not in st.session_state: st.session_state.sim_neev = 0
 if 'sim_gati' not in st.session_state: st.session_state.sim_gati = 0
 if 'sim_nyay' not in st.session_state: st.session_state.sim_nyay = 0
+if 'sim_model' not in st.session_state: st.session_state.sim_model = "Flat boost"
 
 css = """
 <style>
@@ -261,10 +271,43 @@ def load_data():
     except FileNotFoundError:
         return None
 
-df_raw = load_data()
-if df_raw is None:
+@st.cache_data
+def load_trends(state):
+    # Rolling-window scores written by calculate_metrics.py (one state's slice)
+    try:
+        return load_frame('pillar_trends', states=[state])
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource
+def load_grid(path):
+    # Memory-mapped district x day matrices written by final_clean.py;
+    # opened once per server, rows are sliced without copying
+    try:
+        grid = MatrixStore(path)
+    except FileNotFoundError:
+        return None, {}
+    rows = {loc: i for i, loc in enumerate(zip(grid.labels['state'], grid.labels['district']))}
+    return grid, rows
+
+@st.cache_resource
+def load_rollups():
+    # National / state / district / pincode aggregates written by
+    # calculate_metrics.py; card values and drill-downs are index lookups
+    return load_cube()
+
+@st.cache_resource
+def load_simulator():
+    # Base scores held once per server; each scenario is computed once
+    # and kept in the simulator's LRU (see simulator.py)
+    df = load_data()
+    return None if df is None else WhatIfSimulator(df)
+
+simulator = load_simulator()
+if simulator is None:
     st.error("DATA MISSING: 'aadhaar_hackathon_final_dashboard.csv' not found.")
     st.stop()
+df_raw = simulator.frame
 
 # ==========================================
 # 3. FLOATING WHAT-IF SIMULATOR
@@ -274,6 +317,9 @@ with st.expander("What-If Simulator", expanded=False):
     
     if enable_sim:
         st.write("Test interventions:")
+        st.radio("Impact model", ["Flat boost", "Rank-aware"], key='sim_model', horizontal=True,
+                 help="Rank-aware: camps and sync protocols reach districts scoring below 50; "
+                      "their update ratio and volatility move and every district is re-ranked.")
         st.slider("Camps (NEEV)", 0, 20, key='sim_neev')
         st.slider("Sync (GATI)", 0, 20, key='sim_gati')
         st.slider("Vans (NYAY)", 0, 20, key='sim_nyay')
@@ -285,27 +331,12 @@ with st.expander("What-If Simulator", expanded=False):
 # ==========================================
 # 4. DATA PROCESSING
 # ==========================================
-df_sim = df_raw.copy()
-
-if enable_sim:
-    df_sim['NEEV_Score'] = (df_sim['MBCI_Score'] + st.session_state.sim_neev).clip(upper=100)
-    df_sim['GATI_Score'] = (100 - df_sim['ALV_Score'] + st.session_state.sim_gati).clip(upper=100)
-    df_sim['NYAY_Score'] = (df_sim['SEC_Score'] + st.session_state.sim_nyay).clip(upper=100)
-    
-    df_sim['SAMARTH_Score'] = (
-        (0.4 * df_sim['NEEV_Score']) + 
-        (0.3 * df_sim['GATI_Score']) + 
-        (0.3 * df_sim['NYAY_Score'])
-    )
-else:
-    df_sim['NEEV_Score'] = df_sim['MBCI_Score']
-    df_sim['GATI_Score'] = 100 - df_sim['ALV_Score']
-    df_sim['NYAY_Score'] = df_sim['SEC_Score']
-    df_sim['SAMARTH_Score'] = (
-        (0.4 * df_sim['NEEV_Score']) + 
-        (0.3 * df_sim['GATI_Score']) + 
-        (0.3 * df_sim['NYAY_Score'])
-    )
+# Slider deltas (0 when simulation is off); the frame comes from the
+# simulator's cache once the state view is known (section 5)
+sim_deltas = (
+    (st.session_state.sim_neev, st.session_state.sim_gati, st.session_state.sim_nyay)
+    if enable_sim else (0, 0, 0)
+)
 
 # ==========================================
 # 5. HEADER
@@ -324,13 +355,14 @@ with c_state:
     st.markdown('<span class="state-label">Select State View</span>', unsafe_allow_html=True)
     selected_state = st.selectbox(
         "Select State View",
-        ["All India"] + sorted(df_sim['state'].unique().tolist()),
+        ["All India"] + simulator.states,
         label_visibility="collapsed"
     )
     st.markdown('</div>', unsafe_allow_html=True)
 
 st.divider()
-df_view = df_sim if selected_state == "All India" else df_sim[df_sim['state'] == selected_state]
+df_view = simulator.scenario(*sim_deltas, selected_state,
+                             rank_aware=enable_sim and st.session_state.sim_model == "Rank-aware")
 
 # ==========================================
 # 6. CUSTOM METRIC CARDS
@@ -351,10 +383,20 @@ def render_metric_card(column, title, value, subtext, color):
     """
     column.markdown(card_html, unsafe_allow_html=True)
 
-render_metric_card(col1, "SAMARTH Score", f"{df_view['SAMARTH_Score'].mean():.1f}", "Overall Index Score", "#063970")
-render_metric_card(col2, "NEEV (Foundation)", f"{df_view['NEEV_Score'].mean():.1f}%", "Compliance (MBCI)", "#FF9933")
-render_metric_card(col3, "GATI (Speed)", f"{df_view['GATI_Score'].mean():.1f}%", "Stability (ALV)", "#063970")
-render_metric_card(col4, "NYAY (Justice)", f"{df_view['NYAY_Score'].mean():.1f}%", "Equity (SEC)", "#138808")
+cube = load_rollups()
+view_key = cube_key('national') if selected_state == "All India" else cube_key('state', selected_state)
+if cube is not None and not enable_sim and view_key in cube.index:
+    # Baseline scores: one precomputed row per view
+    rollup = cube.loc[view_key]
+    card_values = (rollup['SAMARTH_Score'], rollup['MBCI_Score'], 100 - rollup['ALV_Score'], rollup['SEC_Score'])
+else:
+    # Simulated (shifted and clipped) scores are averaged on the fly
+    card_values = tuple(df_view[c].mean() for c in ('SAMARTH_Score', 'NEEV_Score', 'GATI_Score', 'NYAY_Score'))
+
+render_metric_card(col1, "SAMARTH Score", f"{card_values[0]:.1f}", "Overall Index Score", "#063970")
+render_metric_card(col2, "NEEV (Foundation)", f"{card_values[1]:.1f}%", "Compliance (MBCI)", "#FF9933")
+render_metric_card(col3, "GATI (Speed)", f"{card_values[2]:.1f}%", "Stability (ALV)", "#063970")
+render_metric_card(col4, "NYAY (Justice)", f"{card_values[3]:.1f}%", "Equity (SEC)", "#138808")
 
 # ==========================================
 # 7. HEATMAP
@@ -414,6 +456,92 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# DISTRICT TREND (Rolling Windows)
+st.markdown("### District Trend")
+c_pick, c_window = st.columns([7.0, 3.0])
+with c_pick:
+    trend_options = df_view[['state', 'district']].drop_duplicates().sort_values(['state', 'district'])
+    trend_pick = st.selectbox(
+        "District",
+        list(trend_options.itertuples(index=False, name=None)),
+        format_func=lambda loc: f"{loc[1]} ({loc[0]})"
+    )
+with c_window:
+    trend_window = st.radio("Window (days)", [7, 30, 90], index=1, horizontal=True)
+
+df_trend = load_trends(trend_pick[0]) if trend_pick else None
+if df_trend is None:
+    st.caption("Trend data missing: run calculate_metrics.py to generate 'pillar_trends'.")
+else:
+    df_trend = df_trend[(df_trend['district'] == trend_pick[1]) & (df_trend['window_days'] == trend_window)]
+    df_trend = df_trend.sort_values('date').assign(
+        NEEV=df_trend['MBCI_Score'],
+        GATI=100 - df_trend['ALV_Score'],
+        NYAY=df_trend['SEC_Score'],
+        SAMARTH=df_trend['SAMARTH_Score']
+    )
+    fig_trend = px.line(
+        df_trend,
+        x='date',
+        y=['SAMARTH', 'NEEV', 'GATI', 'NYAY'],
+        color_discrete_sequence=['#B92B27', '#FF9933', '#063970', '#138808'],
+        title=""
+    )
+    fig_trend.update_layout(**shared_chart_layout, height=350, xaxis_title="Date", yaxis_title="Score", legend_title_text="")
+    st.plotly_chart(fig_trend, use_container_width=True)
+    st.markdown(f"<div class='chart-note'>Scores over trailing {trend_window}-day windows. NYAY uses the all-time pincode spread.</div>", unsafe_allow_html=True)
+
+grid, grid_rows = load_grid('final_matrix_biometric')
+if grid is not None and trend_pick in grid_rows:
+    # Daily uploads behind GATI: one row of the biometric grid
+    fig_spark = px.area(x=grid.dates, y=grid['bio_age_5_17'][grid_rows[trend_pick]], title="")
+    fig_spark.update_traces(line_color='#063970')
+    fig_spark.update_layout(**shared_chart_layout, height=160, xaxis_title="", yaxis_title="Uploads/day")
+    st.plotly_chart(fig_spark, use_container_width=True)
+
+if trend_pick and 'SAMARTH_Low' in df_raw.columns:
+    # Bootstrap bands of the district's baseline scores (calculate_metrics.py)
+    band_row = df_raw[(df_raw['state'] == trend_pick[0]) & (df_raw['district'] == trend_pick[1])].iloc[0]
+    w_mbci, w_alv, w_sec = PILLAR_WEIGHTS
+    df_band = pd.DataFrame({
+        'Pillar': ['SAMARTH', 'NEEV', 'GATI', 'NYAY'],
+        'Score': [w_mbci * band_row['MBCI_Score'] + w_alv * (100 - band_row['ALV_Score']) + w_sec * band_row['SEC_Score'],
+                  band_row['MBCI_Score'], 100 - band_row['ALV_Score'], band_row['SEC_Score']],
+        'Low': [band_row['SAMARTH_Low'], band_row['MBCI_Low'], 100 - band_row['ALV_High'], band_row['SEC_Low']],
+        'High': [band_row['SAMARTH_High'], band_row['MBCI_High'], 100 - band_row['ALV_Low'], band_row['SEC_High']],
+    })
+    fig_band = px.scatter(
+        df_band,
+        x='Score',
+        y='Pillar',
+        color='Pillar',
+        error_x=(df_band['High'] - df_band['Score']).clip(lower=0),
+        error_x_minus=(df_band['Score'] - df_band['Low']).clip(lower=0),
+        color_discrete_sequence=['#B92B27', '#FF9933', '#063970', '#138808'],
+        title=""
+    )
+    fig_band.update_layout(**shared_chart_layout, height=220, showlegend=False, xaxis_title="Score (95% band)", yaxis_title="")
+    fig_band.update_xaxes(range=[0, 100])
+    st.plotly_chart(fig_band, use_container_width=True)
+    st.markdown("<div class='chart-note'>Wide bands: few active days or pincodes, so the score is less certain.</div>", unsafe_allow_html=True)
+
+if trend_pick and cube is not None and ('pincode',) + tuple(trend_pick) in cube.index:
+    # Pincode drill-down: the district's slice of the cube
+    df_pins = cube.loc[('pincode',) + tuple(trend_pick)].nlargest(20, 'updates').reset_index()
+    fig_pins = px.bar(
+        df_pins,
+        x='pincode',
+        y=['updates', 'enrolments'],
+        barmode='group',
+        color_discrete_sequence=['#063970', '#FF9933'],
+        title=""
+    )
+    fig_pins.update_layout(**shared_chart_layout, height=260, xaxis_title="Pincode", yaxis_title="Volume", legend_title_text="")
+    fig_pins.update_xaxes(type='category')
+    st.plotly_chart(fig_pins, use_container_width=True)
+    n_pins = int(cube.loc[cube_key('district', *trend_pick), 'n_pincodes'])
+    st.markdown(f"<div class='chart-note'>Top 20 of {n_pins} pincodes by biometric updates.</div>", unsafe_allow_html=True)
+
 st.markdown("---")
 st.header("Deep Dive Diagnostics")
 tab_neev, tab_gati, tab_nyay = st.tabs([" NEEV (Compliance)", " GATI (Stability)", " NYAY (Equity)"])
@@ -433,6 +561,9 @@ with tab_neev:
             orientation='h', 
             color='NEEV_Score', 
             color_continuous_scale='Oranges_r',
+            # Bootstrap band of MBCI, moved with any simulated shift
+            error_x=(neev_df['MBCI_High'] - neev_df['MBCI_Score']).clip(lower=0) if 'MBCI_High' in neev_df.columns else None,
+            error_x_minus=(neev_df['MBCI_Score'] - neev_df['MBCI_Low']).clip(lower=0) if 'MBCI_Low' in neev_df.columns else None,
             title="Bottom 15 Districts (Requires Action)"
         )
         fig_neev.update_layout(**shared_chart_layout, xaxis_title="Compliance Score", yaxis_title="District")
@@ -460,6 +591,8 @@ with tab_gati:
             color='GATI_Score', 
             color_continuous_scale='RdYlGn', 
             hover_name='district',
+            # Batch-dump diagnostics (dashboards built before spike detection lack them)
+            hover_data=[c for c in ('Spike_Days', 'Spike_Volume_Share', 'Burst_Score') if c in df_view.columns],
             size='Raw_Ratio',
             title="Stability vs Volatility (Top-Left is Best)"
         )
@@ -472,7 +605,9 @@ with tab_gati:
     with c2:
         st.markdown("<div style='background-color:#E8F0FE; border-left:6px solid #063970; padding:15px; border-radius:8px; color:#000000; font-weight:700;'>Recommendation: Implement Daily Sync Protocols.</div>", unsafe_allow_html=True)
         st.markdown("<div class='tech-note-box'><b>Technical Formula:</b></div>", unsafe_allow_html=True)
-        st.latex(r"GATI = 100 - (\frac{\sigma_{daily}}{\sigma_{max}} \times 100)")
+        st.latex(rf"GATI = 100 - ({1 - ALV_BURST_WEIGHT:g} \times \frac{{\sigma_{{daily}}}}{{\sigma_{{max}}}} \times 100"
+                 rf" + {ALV_BURST_WEIGHT:g} \times Burst)")
+        st.latex(r"Burst = 100 \times \frac{\sum_{spike\ days}(x_d - baseline_d)}{\sum_d x_d}")
 
 # --- TAB 3: NYAY ---
 with tab_nyay:
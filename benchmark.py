@@ -0,0 +1,467 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# SAMARTH PIPELINE BENCHMARK SUITE
+# ==========================================
+# Generates a seeded synthetic Aadhaar feed (misspelt states/districts,
+# invalid pincodes, duplicate rows, missing days) at a chosen scale, then
+# times and memory-profiles every stage, each in a fresh process, and
+# appends one JSON line per stage to the results file.
+#
+#   python benchmark.py --scale 1m
+#   python benchmark.py --scale 10m --stages preprocessing,final_clean
+#   python benchmark.py --scale 1m --compare bench_results.jsonl
+#
+# Each run writes into --workdir; the raw shards are reused while the
+# scale and seed stay the same.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCALES = {
+    'small': dict(rows=100_000, districts=200, pincodes=2_000),
+    '1m': dict(rows=1_000_000, districts=1_000, pincodes=20_000),
+    '10m': dict(rows=10_000_000, districts=1_000, pincodes=20_000),
+    '100m': dict(rows=100_000_000, districts=1_000, pincodes=20_000),
+}
+
+DATASETS = {
+    'biometric': ['bio_age_5_17', 'bio_age_17_'],
+    'demographic': ['demo_age_5_17', 'demo_age_17_'],
+    'enrolment': ['age_0_5', 'age_5_17', 'age_18_greater'],
+}
+
+# Share of rows carrying each kind of dirt
+MISSPELL_RATE = 0.15
+INVALID_PINCODE_RATE = 0.005
+INVALID_DATE_RATE = 0.001
+MISSING_METADATA_RATE = 0.001
+DUPLICATE_RATE = 0.01
+NAN_VALUE_RATE = 0.005
+NEGATIVE_VALUE_RATE = 0.001
+SPIKE_RATE = 0.005          # batch dumps: 20x the usual volume
+MISSING_DAY_RATE = 0.05     # (district, day) pairs with no uploads at all
+
+SPELLING_VARIANTS = 3
+SYLLABLES = ['ka', 'ra', 'pur', 'na', 'ga', 'bad', 'la', 'ma', 'ti', 'shi', 'van', 'dhar',
+             'gar', 'kot', 'sa', 'ja', 'li', 'ur', 'pa', 'hal', 'dan', 'bi', 'mo', 'si']
+
+# Pipeline order: stages later in the list read what earlier ones wrote
+STAGES = [
+    'load_shards', 'clean_pipeline', 'stream_pipeline', 'create_master_continuity',
+    'preprocessing', 'final_clean', 'clean_districts_in_state', 'sec_scores',
+    'calculate_metrics', 'app_rerun', 'app_drag',
+]
+SCRIPT_STAGES = {
+    'preprocessing': 'preprocessing.py',
+    'final_clean': 'final_clean.py',
+    'calculate_metrics': 'calculate_metrics.py',
+}
+APP_RERUNS = 20
+
+# ==========================================
+# 1. SYNTHETIC FEED GENERATOR
+# ==========================================
+
+def _misspell(name, rng):
+    """One plausible data-entry variant of `name`."""
+    op = rng.integers(0, 6)
+    i = int(rng.integers(1, max(len(name) - 1, 2)))
+    if op == 0 and len(name) > 4:
+        return name[:i] + name[i + 1:]                        # dropped letter
+    if op == 1 and len(name) > 3:
+        return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]  # swapped letters
+    if op == 2:
+        return name[:i] + name[i] + name[i:]                  # doubled letter
+    if op == 3:
+        return name.upper()
+    if op == 4:
+        return name.replace(' ', '') if ' ' in name else name.lower()
+    return f"  {name} "
+
+
+class SyntheticFeed:
+    """
+    Seeded layout of the country: districts in states, pincodes in districts,
+    per-district volume and silent days, plus the raw spellings of each name.
+    """
+    def __init__(self, districts, pincodes, days=365, seed=7):
+        from cleaning_engines import TARGET_LOCATIONS
+
+        rng = np.random.default_rng(seed)
+        self.days = days
+        self.dates = pd.date_range('2025-01-01', periods=days, freq='D').strftime('%d-%m-%Y').to_numpy(dtype=object)
+
+        names = set()
+        while len(names) < districts:
+            parts = rng.choice(SYLLABLES, int(rng.integers(2, 5)))
+            names.add(''.join(parts).title())
+        district_names = sorted(names)
+        self.state_of_district = rng.integers(0, len(TARGET_LOCATIONS), districts)
+
+        self.state_variants = np.array(
+            [[s] + [_misspell(s, rng) for _ in range(SPELLING_VARIANTS)] for s in TARGET_LOCATIONS],
+            dtype=object
+        )
+        self.district_variants = np.array(
+            [[d] + [_misspell(d, rng) for _ in range(SPELLING_VARIANTS)] for d in district_names],
+            dtype=object
+        )
+
+        # Every district gets at least one pincode; the rest land anywhere
+        self.pincodes = rng.choice(np.arange(110000, 860000), pincodes, replace=False)
+        extra = rng.integers(0, districts, max(pincodes - districts, 0))
+        self.district_of_pincode = np.concatenate([np.arange(min(districts, pincodes)), extra])
+        # Skewed pincode traffic so SEC spans the whole range
+        weights = rng.lognormal(0, 1.2, pincodes)
+        self.pincode_weights = weights / weights.sum()
+
+        self.rate = rng.lognormal(1.5, 0.6, districts)
+        self.silent = rng.random((districts, days)) < MISSING_DAY_RATE
+
+    def rows(self, n, value_cols, rng):
+        """`n` raw rows (before duplicates and silent days) for one shard."""
+        pin = rng.choice(len(self.pincodes), n, p=self.pincode_weights)
+        district = self.district_of_pincode[pin]
+        day = rng.integers(0, self.days, n)
+        keep = ~self.silent[district, day]
+        pin, district, day = pin[keep], district[keep], day[keep]
+        m = len(pin)
+
+        def variant():
+            return np.where(rng.random(m) < MISSPELL_RATE, rng.integers(1, SPELLING_VARIANTS + 1, m), 0)
+
+        df = pd.DataFrame({
+            'date': self.dates[day],
+            'state': self.state_variants[self.state_of_district[district], variant()],
+            'district': self.district_variants[district, variant()],
+            'pincode': self.pincodes[pin].astype(str).astype(object),
+        })
+        bad = rng.random(m) < INVALID_DATE_RATE
+        df.loc[bad, 'date'] = rng.choice(['31-02-2025', '2025/01/01', 'NA'], int(bad.sum()))
+        bad = rng.random(m) < INVALID_PINCODE_RATE
+        df.loc[bad, 'pincode'] = rng.choice(['12A45', '9999', '1234567', '00000X'], int(bad.sum()))
+        for col in ['date', 'state', 'district', 'pincode']:
+            df.loc[rng.random(m) < MISSING_METADATA_RATE, col] = np.nan
+
+        for col in value_cols:
+            values = rng.poisson(self.rate[district]).astype('float64')
+            values[rng.random(m) < SPIKE_RATE] *= 20
+            values[rng.random(m) < NAN_VALUE_RATE] = np.nan
+            values[rng.random(m) < NEGATIVE_VALUE_RATE] = -1
+            df[col] = values
+
+        dupes = df[rng.random(m) < DUPLICATE_RATE]
+        return pd.concat([df, dupes], ignore_index=True)
+
+
+def generate_feed(workdir, rows, districts, pincodes, days=365, seed=7, shard_rows=1_000_000):
+    """
+    Writes raw shards for every dataset into `workdir`, named like the real
+    feed (api_data_aadhar_<dataset>_<start>_<end>.csv). Skipped when the
+    shards for the same parameters already exist.
+    """
+    params = dict(rows=rows, districts=districts, pincodes=pincodes, days=days, seed=seed, shard_rows=shard_rows)
+    stamp = os.path.join(workdir, 'feed.json')
+    if os.path.exists(stamp):
+        with open(stamp) as fh:
+            if json.load(fh) == params:
+                print(f"♻️  Reusing synthetic feed in {workdir}")
+                return params
+    if os.path.isdir(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+
+    feed = SyntheticFeed(districts, pincodes, days, seed)
+    for k, (name, cols) in enumerate(DATASETS.items()):
+        rng = np.random.default_rng([seed, k])
+        for start in range(0, rows, shard_rows):
+            n = min(shard_rows, rows - start)
+            shard = feed.rows(n, cols, rng)
+            shard.to_csv(os.path.join(workdir, f"api_data_aadhar_{name}_{start}_{start + n}.csv"), index=False)
+        print(f"🧪 Generated {name}: {rows} rows")
+
+    with open(stamp, 'w') as fh:
+        json.dump(params, fh)
+    return params
+
+# ==========================================
+# 2. STAGE RUNNERS
+# ==========================================
+# Function stages run in a child process: setup (reading inputs) is not
+# timed, only the call itself. Script stages run the real pipeline scripts.
+
+def _raw_pattern(name):
+    return f"api_data_aadhar_{name}_*.csv"
+
+
+def _current_rss_mb():
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def _maxrss_mb(usage):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return usage.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def _setup_stage(stage):
+    """Returns (run, rows_in); run() executes the stage and returns rows out."""
+    from preprocessing import AadhaarDataRefinery
+    from columnar_store import load_frame
+
+    bio_cols = DATASETS['biometric']
+    refinery = AadhaarDataRefinery('Biometric')
+
+    if stage == 'load_shards':
+        return lambda: len(refinery.load_shards(_raw_pattern('biometric'))), None
+    if stage == 'clean_pipeline':
+        raw = refinery.load_shards(_raw_pattern('biometric'))
+        return lambda: len(refinery.clean_pipeline(raw, bio_cols)), len(raw)
+    if stage == 'stream_pipeline':
+        return lambda: len(refinery.stream_pipeline(_raw_pattern('biometric'), bio_cols)[0]), None
+    if stage == 'create_master_continuity':
+        clean, _ = refinery.stream_pipeline(_raw_pattern('biometric'), bio_cols)
+        return lambda: len(refinery.create_master_continuity(clean, bio_cols)), len(clean)
+    if stage == 'clean_districts_in_state':
+        from cleaning_engines import StateCanonicalizer, clean_districts_in_state
+        df = load_frame('phase2_ready_biometric', columns=['state', 'district'])
+        df['state'] = StateCanonicalizer().canonicalize(df['state'])
+        largest = df['state'].value_counts().index[0]
+        subset = df[df['state'] == largest]
+        return lambda: clean_districts_in_state(subset).nunique(), len(subset)
+    if stage == 'sec_scores':
+        from calculate_metrics import sec_scores
+        pincodes = load_frame('final_pincodes_biometric', columns=['district_id', 'pincode', 'bio_age_5_17'])
+        return lambda: len(sec_scores(pincodes)), len(pincodes)
+    if stage == 'app_rerun':
+        from rollup_cube import cube_key, load_cube
+        from simulator import ALL_STATES, WhatIfSimulator
+        dashboard = pd.read_csv('aadhaar_hackathon_final_dashboard.csv')
+        # Both built once per server in app.py (st.cache_resource)
+        simulator = WhatIfSimulator(dashboard)
+        cube = load_cube()
+        # Clicking through the state views
+        views = [ALL_STATES] + simulator.states
+
+        def rerun():
+            # Mirrors the per-rerun work of app.py sections 4-6 (simulation off)
+            for i in range(APP_RERUNS):
+                state = views[i % len(views)]
+                df_view = simulator.scenario(0, 0, 0, state, rank_aware=False)
+                rollup = cube.loc[cube_key('national') if state == ALL_STATES else cube_key('state', state)]
+                card_values = (rollup['SAMARTH_Score'], rollup['MBCI_Score'],
+                               100 - rollup['ALV_Score'], rollup['SEC_Score'])
+            return len(df_view)
+        return rerun, len(dashboard)
+    if stage == 'app_drag':
+        from simulator import ALL_STATES, WhatIfSimulator
+        dashboard = pd.read_csv('aadhaar_hackathon_final_dashboard.csv')
+        # Built once per server in app.py (st.cache_resource)
+        simulator = WhatIfSimulator(dashboard)
+        # One slider dragged up and back down again
+        drag = [min(i, APP_RERUNS - i) for i in range(APP_RERUNS)]
+
+        def rerun():
+            # Mirrors the per-rerun work of app.py sections 4-5 (simulation on)
+            for neev in drag:
+                df_view = simulator.scenario(neev, 0, 0, ALL_STATES)
+            return len(df_view)
+        return rerun, len(dashboard)
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def run_function_stage(stage, result_file):
+    """Child side: times one function stage and writes its measurements."""
+    import resource
+
+    run, rows_in = _setup_stage(stage)
+    baseline = _current_rss_mb()
+    wall, cpu = time.perf_counter(), time.process_time()
+    rows_out = run()
+    record = {
+        'wall_s': time.perf_counter() - wall,
+        'cpu_s': time.process_time() - cpu,
+        'peak_rss_mb': _maxrss_mb(resource.getrusage(resource.RUSAGE_SELF)),
+        'baseline_rss_mb': baseline,
+        'rows_in': rows_in,
+        'rows_out': int(rows_out),
+    }
+    if stage in ('app_rerun', 'app_drag'):
+        record['reruns'] = APP_RERUNS
+    with open(result_file, 'w') as fh:
+        json.dump(record, fh)
+
+
+def run_stage(stage, workdir, log_dir):
+    """Parent side: runs one stage in a fresh process and measures it."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])))
+    result_file = os.path.abspath(os.path.join(log_dir, f"{stage}.json"))
+    if stage in SCRIPT_STAGES:
+        cmd = [sys.executable, os.path.join(REPO_DIR, SCRIPT_STAGES[stage])]
+    else:
+        cmd = [sys.executable, os.path.abspath(__file__), '--run-stage', stage, '--result-file', result_file]
+
+    with open(os.path.join(log_dir, f"{stage}.log"), 'w') as log:
+        wall = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - wall
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    record = {'status': 'ok' if proc.returncode == 0 else f"exit {proc.returncode}"}
+    if stage in SCRIPT_STAGES:
+        record.update(wall_s=wall, cpu_s=usage.ru_utime + usage.ru_stime, peak_rss_mb=_maxrss_mb(usage))
+    elif os.path.exists(result_file):
+        with open(result_file) as fh:
+            record.update(json.load(fh))
+    return record
+
+
+def _reset_outputs(workdir):
+    """Removes everything but the raw shards, so every run starts cold."""
+    for entry in os.listdir(workdir):
+        if entry.startswith('api_data_aadhar_') or entry == 'feed.json':
+            continue
+        path = os.path.join(workdir, entry)
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ==========================================
+# 3. REGRESSION CHECK
+# ==========================================
+
+def compare(records, baseline_path, tolerance):
+    """
+    Flags stages that got slower or hungrier than the latest successful
+    baseline record at the same scale. Returns the number of regressions.
+    """
+    run_ids = {rec['run_id'] for rec in records}
+    latest = {}
+    with open(baseline_path) as fh:
+        for line in fh:
+            rec = json.loads(line)
+            if rec['run_id'] not in run_ids and rec['status'] == 'ok':
+                latest[(rec['stage'], json.dumps(rec['scale'], sort_keys=True))] = rec
+
+    regressions = 0
+    print(f"\n{'stage':<26}{'metric':<13}{'baseline':>10}{'now':>10}{'change':>9}")
+    for rec in records:
+        base = latest.get((rec['stage'], json.dumps(rec['scale'], sort_keys=True)))
+        if base is None:
+            continue
+        for metric in ('wall_s', 'peak_rss_mb'):
+            old, new = base.get(metric), rec.get(metric)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            flag = ''
+            if change > tolerance:
+                flag = '  ⚠️ REGRESSION'
+                regressions += 1
+            print(f"{rec['stage']:<26}{metric:<13}{old:>10.2f}{new:>10.2f}{change:>+9.0%}{flag}")
+    return regressions
+
+# ==========================================
+# 4. EXECUTION
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks every SAMARTH stage on a synthetic feed.")
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--rows', type=int, help="rows per dataset (overrides --scale)")
+    parser.add_argument('--districts', type=int)
+    parser.add_argument('--pincodes', type=int)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--shard-rows', type=int, default=1_000_000)
+    parser.add_argument('--stages', help="comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument('--workdir', default='bench_data')
+    parser.add_argument('--output', default='bench_results.jsonl')
+    parser.add_argument('--compare', help="baseline JSONL; exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument('--run-stage', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_function_stage(args.run_stage, args.result_file)
+        return 0
+
+    scale = dict(SCALES[args.scale])
+    for key in ('rows', 'districts', 'pincodes'):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    scale['days'] = args.days
+
+    stages = args.stages.split(',') if args.stages else STAGES
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    sys.path.insert(0, REPO_DIR)
+    generate_feed(args.workdir, seed=args.seed, shard_rows=args.shard_rows, **scale)
+    _reset_outputs(args.workdir)
+    log_dir = os.path.join(args.workdir, 'bench_logs')
+    os.makedirs(log_dir)
+
+    run_id = time.strftime('%Y%m%dT%H%M%S')
+    meta = {
+        'run_id': run_id, 'git_rev': _git_revision(), 'scale': scale, 'seed': args.seed,
+        'python': sys.version.split()[0], 'pandas': pd.__version__, 'numpy': np.__version__,
+    }
+    # Pipeline scripts ahead of the last selected stage always run, since
+    # the outputs were reset; only the selected stages are recorded.
+    last = max(STAGES.index(s) for s in stages)
+    records = []
+    for stage in STAGES[:last + 1]:
+        if stage in SCRIPT_STAGES and stage not in stages:
+            print(f"⚙️  {stage} (setup)", flush=True)
+            run_stage(stage, args.workdir, log_dir)
+        elif stage in stages:
+            print(f"⏱️  {stage} ...", end=' ', flush=True)
+            record = dict(meta, stage=stage, **run_stage(stage, args.workdir, log_dir))
+            records.append(record)
+            print(f"{record.get('wall_s', float('nan')):.2f}s, peak {record.get('peak_rss_mb', float('nan')):.0f} MB [{record['status']}]")
+        if stage == 'preprocessing':
+            # Hand-off described in the README: masters become phase 2 inputs
+            for name in DATASETS:
+                src = os.path.join(args.workdir, f"cleaned_master_{name}")
+                if os.path.isdir(src):
+                    shutil.copytree(src, os.path.join(args.workdir, f"phase2_ready_{name}"))
+
+    with open(args.output, 'a') as fh:
+        for record in records:
+            fh.write(json.dumps(record) + '\n')
+    print(f"\n💾 {len(records)} stage results appended to {args.output}")
+
+    if args.compare:
+        regressions = compare(records, args.compare, args.tolerance)
+        if regressions:
+            print(f"❌ {regressions} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+        print("✅ No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import hashlib
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# ==========================================
+# BATCHED BOOTSTRAP RESAMPLING
+# ==========================================
+# A resample is stored as a count per item (how often each day or pincode
+# was drawn), never as a copy of the data. A block of resamples is then a
+# (resamples, items) count matrix, and resampled sums for every district
+# are one matrix product with the district x day matrix:
+#
+#   w = multinomial_weights(rng, n_days, 100)   # (100, days)
+#   sums = bio_matrix @ w.T                     # (districts, 100)
+
+
+def multinomial_weights(rng, n_items, n_resamples):
+    """Draw counts of `n_items` items resampled with replacement, one row per resample."""
+    return rng.multinomial(n_items, np.full(n_items, 1 / n_items), size=n_resamples)
+
+
+def stable_seed(*names):
+    """64-bit seed from `names`, the same in every process (unlike hash())."""
+    digest = hashlib.sha256('\x1f'.join(map(str, names)).encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+def group_resample_weights(rngs, starts, sizes, n_resamples):
+    """
+    Like multinomial_weights, but every group of items (contiguous, given by
+    `starts` and `sizes`) is resampled on its own, to its own size, from its
+    own generator in `rngs`. A group's draws do not depend on the others.
+    """
+    n_items = int(sizes.sum())
+    first = np.repeat(starts, sizes)
+    span = np.repeat(sizes, sizes)
+    uniform = np.hstack([rng.random((n_resamples, size)) for rng, size in zip(rngs, sizes)])
+    picks = first + (uniform * span).astype('int64')
+    flat = (np.arange(n_resamples)[:, None] * n_items + picks).ravel()
+    return np.bincount(flat, minlength=n_resamples * n_items).reshape(n_resamples, n_items)
+
+
+def weighted_gini_by_group(values, weights, starts, sizes):
+    """
+    Gini of every group in every resample, as a (resamples, groups) array.
+    `values` are sorted within each group; an item drawn w times occupies w
+    consecutive ranks, so the sorted form of gini_by_group becomes
+    G = sum(w x (2C - w - n)) / (n * sum(w x)), C = cumulative count.
+    Groups whose resample has no volume are NaN.
+    """
+    weights = np.asarray(weights, dtype='float64')
+    cum = np.cumsum(weights, axis=1)
+    # Cumulative counts restart at every group
+    before = np.pad(cum, ((0, 0), (1, 0)))[:, starts]
+    cum -= np.repeat(before, sizes, axis=1)
+    n = np.repeat(sizes, sizes)
+
+    volume = weights * values
+    totals = np.add.reduceat(volume, starts, axis=1)
+    weighted = np.add.reduceat(volume * (2 * cum - weights - n), starts, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(totals > 0, weighted / (sizes * totals), np.nan)
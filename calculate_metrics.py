@@ -1,185 +1,479 @@
-import pandas as pd
-import numpy as np
-import glob
-import difflib
+import argparse
+
+from lazy_imports import lazy_import
+from columnar_store import write_store
+from location_registry import DISTRICT_ID_DTYPE, LocationRegistry
+from matrix_store import MatrixStore
+from pillar_weights import ALV_BURST_WEIGHT, PILLAR_WEIGHTS
+from rollup_cube import CUBE_PATH, build_rollup_cube, write_cube
+from bootstrap_ci import group_resample_weights, multinomial_weights, stable_seed, weighted_gini_by_group
+from spike_detector import detect_batch_dumps
+from telemetry import save_report, start_run, step
+from metric_engine import (
+    MetricEngine, MomentAccumulator, PincodeVolumeAccumulator, SumAccumulator, std_with_zeros
+)
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 # ==========================================
-# 0. CONFIGURATION & CLEANING MODEL (Re-used for Raw Data)
+# 0. SHARED HELPERS
 # ==========================================
-OFFICIAL_STATES = [
-    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa", 
-    "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala", 
-    "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland", 
-    "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura", 
-    "Uttar Pradesh", "Uttarakhand", "West Bengal"
-]
-OFFICIAL_UTS = [
-    "Andaman and Nicobar Islands", "Chandigarh", "Dadra and Nagar Haveli and Daman & Diu", 
-    "Delhi (NCT)", "Jammu & Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
-]
-TARGET_LOCATIONS = OFFICIAL_STATES + OFFICIAL_UTS
-
-MANUAL_MAP = {
-    'Nct Of Delhi': 'Delhi (NCT)', 'Delhi': 'Delhi (NCT)', 'New Delhi': 'Delhi (NCT)',
-    'Dadra And Nagar Haveli': 'Dadra and Nagar Haveli and Daman & Diu',
-    'Daman And Diu': 'Dadra and Nagar Haveli and Daman & Diu',
-    'Dadra & Nagar Haveli': 'Dadra and Nagar Haveli and Daman & Diu',
-    'The Dadra And Nagar Haveli And Daman And Diu': 'Dadra and Nagar Haveli and Daman & Diu',
-    'Jammu And Kashmir': 'Jammu & Kashmir', 'West Bangal': 'West Bengal',
-    'Westbengal': 'West Bengal', 'West  Bengal': 'West Bengal',
-    'Chhatisgarh': 'Chhattisgarh', 'Tamilnadu': 'Tamil Nadu',
-    'Orissa': 'Odisha', 'Pondicherry': 'Puducherry',
-    'Uttaranchal': 'Uttarakhand', 'Ladhak': 'Ladakh'
-}
-
-def get_clean_state(name):
-    if pd.isna(name): return "UNKNOWN"
-    clean = str(name).strip().title()
-    for bad, good in MANUAL_MAP.items():
-        if bad.lower() == clean.lower(): return good
-    for target in TARGET_LOCATIONS:
-        if target.lower() == clean.lower(): return target
-    matches = difflib.get_close_matches(clean, TARGET_LOCATIONS, n=1, cutoff=0.6)
-    return matches[0] if matches else "UNKNOWN"
-
-def clean_districts_in_state(df_state):
-    districts = df_state['district'].value_counts().index.tolist()
-    mapping = {}
-    processed = set()
-    for dist in districts:
-        if dist in processed: continue
-        mapping[dist] = dist
-        processed.add(dist)
-        matches = difflib.get_close_matches(dist, districts, n=10, cutoff=0.85)
-        for match in matches:
-            if match not in processed:
-                mapping[match] = dist
-                processed.add(match)
-    return df_state['district'].map(mapping)
+# All cleaning (states, district clusters, pincodes) happens once in
+# final_clean.py; this stage only reads its stores.
+
+# Rows per chunk when scanning the stores (None = whole store at once)
+METRIC_CHUNK_SIZE = 1_000_000
+
+def pillar_accumulators():
+    """Every per-district statistic the pillars need, gathered in one scan per store."""
+    return {
+        'bio_daily': MomentAccumulator('final_cleaned_biometric', 'bio_age_5_17'),
+        'enrol_total': SumAccumulator('final_cleaned_enrolment', 'age_5_17'),
+        'bio_pincodes': PincodeVolumeAccumulator('final_pincodes_biometric', 'bio_age_5_17'),
+        'enrol_pincodes': PincodeVolumeAccumulator('final_pincodes_enrolment', 'age_5_17'),
+    }
+
+def pincode_volumes(acc):
+    """Updates and enrolments per (district_id, pincode); 0 where a store lacks the pair."""
+    empty = pd.Series(dtype='float64', index=pd.MultiIndex.from_arrays(
+        [np.array([], dtype=DISTRICT_ID_DTYPE), np.array([], dtype='int64')], names=['district_id', 'pincode']))
+    volumes = {'updates': acc['bio_pincodes'].result(), 'enrolments': acc['enrol_pincodes'].result()}
+    return pd.DataFrame({k: empty if v is None else v for k, v in volumes.items()}).fillna(0)
 
 # ==========================================
 # PART 1: MBCI & ALV (The Realistic Approach)
 # ==========================================
 
-def calculate_mbci_alv_realistic():
+SPIKE_COLS = ['Spike_Days', 'Spike_Volume_Share', 'Burst_Score']
+
+def calculate_batch_dumps(through=None):
+    """
+    Spike days of every district from the biometric matrix, in one pass.
+    Returns (per-district stats, excess matrix, first day of its columns);
+    without a matrix, the stats are empty and the rest None.
+    """
+    print("   ... Detecting Batch Dumps (Spike Days per District)")
+    try:
+        grid = MatrixStore(BIO_MATRIX[0])
+    except FileNotFoundError as exc:
+        print(f"⚠️  WARNING: {exc}")
+        return pd.DataFrame(columns=SPIKE_COLS, dtype='float64'), None, None
+    with step('batch_dumps', rows_in=len(grid.keys), n_days=grid.n_days) as s:
+        stats, excess = detect_batch_dumps(grid.window(BIO_MATRIX[1], None, through))
+        stats.index = pd.Index(np.asarray(grid.keys), name='district_id')
+        s.rows_out = len(stats)
+        s.fields['spike_days'] = int(stats['Spike_Days'].sum())
+    return stats, excess, grid.start
+
+def calculate_mbci_alv_realistic(acc, spikes):
     print("🚀 PHASE 2 (REALISTIC) START...")
     
-    # Load the Gold Standard Files
-    try:
-        bio = pd.read_csv('final_cleaned_biometric.csv')
-        enrol = pd.read_csv('final_cleaned_enrolment.csv')
-    except FileNotFoundError:
+    # Accumulated from the Gold Standard stores
+    bio = acc['bio_daily'].result()
+    enrol = acc['enrol_total'].result()
+    if bio is None or enrol is None:
         print("❌ CRITICAL: 'final_cleaned' files not found.")
         return pd.DataFrame()
 
     # --- 1. MBCI (Relative Compliance) ---
     print("   ... Calculating MBCI (Percentile Ranking)")
-    bio_total = bio.groupby(['state', 'district'])['bio_age_5_17'].sum().reset_index()
-    enrol_total = enrol.groupby(['state', 'district'])['age_5_17'].sum().reset_index()
-    
-    # Merge & Calculate Raw Ratio
-    mbci_df = pd.merge(bio_total, enrol_total, on=['state', 'district'], suffixes=('_upd', '_base'))
-    mbci_df['Raw_Ratio'] = mbci_df['bio_age_5_17'] / (mbci_df['age_5_17'] + 1)
-    
-    # THE GENUINE FIX: Percentile Ranking
-    # Instead of capping at 100, we rank them. Top performer = 100, Median = 50.
-    mbci_df['MBCI_Score'] = mbci_df['Raw_Ratio'].rank(pct=True) * 100
+    with step('mbci', rows_in=len(bio)) as s:
+        # Joined on compact district IDs (see location_registry.py)
+        mbci_df = pd.merge(bio['sum'].rename('bio_age_5_17'), enrol.rename('age_5_17'),
+                           left_index=True, right_index=True)
+        
+        # Calculate Raw Ratio
+        mbci_df['Raw_Ratio'] = mbci_df['bio_age_5_17'] / (mbci_df['age_5_17'] + 1)
+        
+        # THE GENUINE FIX: Percentile Ranking
+        # Instead of capping at 100, we rank them. Top performer = 100, Median = 50.
+        mbci_df['MBCI_Score'] = mbci_df['Raw_Ratio'].rank(pct=True) * 100
+        s.rows_out = len(mbci_df)
+        s.drops['no_enrolment'] = len(bio) - len(mbci_df)
     
     # --- 2. ALV (Load Volatility) ---
     print("   ... Calculating ALV (Volatility / Batch-Dump Detection)")
-    # We use Standard Deviation of Daily Volume.
-    # High StdDev = Massive spikes (Stress). Low StdDev = Smooth (Resilient).
-    daily_volatility = bio.groupby(['state', 'district'])['bio_age_5_17'].std().reset_index()
-    daily_volatility.rename(columns={'bio_age_5_17': 'Load_Volatility_StdDev'}, inplace=True)
-    
-    # Fill NaNs (for districts with 1 day of data) with 0
-    daily_volatility['Load_Volatility_StdDev'] = daily_volatility['Load_Volatility_StdDev'].fillna(0)
-    
-    # Normalize ALV (Min-Max Scaling)
-    max_vol = daily_volatility['Load_Volatility_StdDev'].max()
-    daily_volatility['ALV_Score'] = (daily_volatility['Load_Volatility_StdDev'] / max_vol) * 100
+    with step('alv', rows_in=len(bio), n_days=acc['bio_daily'].n_days) as s:
+        # We use Standard Deviation of Daily Volume.
+        # High StdDev = Massive spikes (Stress). Low StdDev = Smooth (Resilient).
+        # Days missing from the master (implicit zeros) count as 0 uploads.
+        daily_volatility = std_with_zeros(bio, acc['bio_daily'].n_days).to_frame('Load_Volatility_StdDev')
+        
+        # Fill NaNs (for districts with 1 day of data) with 0
+        daily_volatility['Load_Volatility_StdDev'] = daily_volatility['Load_Volatility_StdDev'].fillna(0)
+        
+        # Normalize ALV (Min-Max Scaling)
+        max_vol = daily_volatility['Load_Volatility_StdDev'].max()
+        daily_volatility['ALV_Score'] = (daily_volatility['Load_Volatility_StdDev'] / max_vol) * 100
+
+        # Enriched GATI: volatility alone cannot tell steady high volume from
+        # hoard-then-sync, so the share of volume dumped in spikes is blended in
+        daily_volatility = daily_volatility.join(spikes[SPIKE_COLS], how='left')
+        daily_volatility[SPIKE_COLS] = daily_volatility[SPIKE_COLS].fillna(0)
+        daily_volatility['Spike_Days'] = daily_volatility['Spike_Days'].astype('int64')
+        daily_volatility['ALV_Score'] = ((1 - ALV_BURST_WEIGHT) * daily_volatility['ALV_Score']
+                                         + ALV_BURST_WEIGHT * daily_volatility['Burst_Score'])
+        s.rows_out = len(daily_volatility)
     
     # Combine Pillars 1 & 2
-    core_metrics = pd.merge(mbci_df, daily_volatility, on=['state', 'district'], how='left')
-    return core_metrics
+    return mbci_df.join(daily_volatility, how='left').reset_index()
 
 # ==========================================
-# PART 2: SEC (Mining Raw Data)
+# PART 2: SEC (Pincode Concentration)
 # ==========================================
 
-def calculate_sec_realistic():
-    print("\n⛏️  PHASE 2 MINING: Extracting Pincodes for SEC...")
+def gini_by_group(keys, values):
+    """
+    Gini coefficient of `values` within each group of `keys`, all groups at once.
+    Uses the sorted form G = sum((2i - n - 1) * x_i) / (n * sum(x)), i = 1..n,
+    which equals the pairwise sum |x_i - x_j| / (n^2 * mean), in O(n log n).
+    Returns (group keys, gini, group sizes, group totals) as arrays.
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype='float64')
+    if len(keys) == 0:
+        empty = np.array([], dtype='float64')
+        return keys, empty, empty.astype('int64'), empty
+
+    # One array sorted by group, then by volume inside each group
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+
+    # 1-based rank of every value inside its group
+    rank = np.arange(1, len(keys) + 1) - np.repeat(starts, sizes)
+    n = np.repeat(sizes, sizes)
+    totals = np.add.reduceat(values, starts)
+    weighted = np.add.reduceat((2 * rank - n - 1) * values, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gini = np.where(totals > 0, weighted / (sizes * totals), 0.0)
+    return keys[starts], gini, sizes, totals
+
+def sec_scores(pincode_df, col='bio_age_5_17', key='district_id'):
+    """
+    SEC = 100 * (1 - Gini) of pincode volumes in `col`, per `key`.
+    Districts with a single pincode or no volume score 0.
+    """
+    groups, gini, sizes, totals = gini_by_group(pincode_df[key].to_numpy(), pincode_df[col].to_numpy())
+    sec = np.where((sizes > 1) & (totals > 0), 100 * (1 - gini), 0.0)
+    return pd.Series(sec, index=pd.Index(groups, name=key), name='SEC_Score')
+
+def calculate_sec_realistic(acc):
+    print("\n⛏️  PHASE 2 MINING: Pincode Concentration (SEC)...")
     
-    raw_files = glob.glob('api_data_aadhar_biometric_*.csv')
-    if not raw_files:
-        print("⚠️  WARNING: No raw files found.")
+    # Pincode totals written by final_clean.py on the same district clusters
+    # as MBCI/ALV, so the raw shards are never re-read or re-cleaned here
+    pincodes = acc['bio_pincodes'].result()
+    if pincodes is None:
         return pd.DataFrame()
-        
-    df_list = []
-    for f in raw_files:
-        df_list.append(pd.read_csv(f))
-    raw_df = pd.concat(df_list, ignore_index=True)
-    
-    # Apply Cleaning Force Model
-    raw_df['state'] = raw_df['state'].apply(get_clean_state)
-    raw_df = raw_df[raw_df['state'] != "UNKNOWN"]
     
-    cleaned_frames = []
-    for state in raw_df['state'].unique():
-        sub = raw_df[raw_df['state'] == state].copy()
-        sub['district'] = clean_districts_in_state(sub)
-        cleaned_frames.append(sub)
-    raw_clean = pd.concat(cleaned_frames)
-    
-    # Gini Calculation
-    def gini(x):
-        total = 0
-        for i, xi in enumerate(x[:-1], 1):
-            total += np.sum(np.abs(xi - x[i:]))
-        return total / (len(x)**2 * np.mean(x)) if np.mean(x) > 0 else 0
-
-    raw_clean['pincode'] = pd.to_numeric(raw_clean['pincode'], errors='coerce')
-    raw_clean = raw_clean.dropna(subset=['pincode'])
-    
-    pincode_dist = raw_clean.groupby(['state', 'district', 'pincode'])['bio_age_5_17'].sum().reset_index()
-    
-    sec_results = []
-    for (state, district), group in pincode_dist.groupby(['state', 'district']):
-        volumes = group['bio_age_5_17'].values
-        if len(volumes) > 1 and np.sum(volumes) > 0:
-            g = gini(volumes)
-            sec_score = 100 * (1 - g) 
+    # Gini of every district in one vectorized pass (see gini_by_group)
+    with step('sec', rows_in=len(pincodes)) as s:
+        sec_df = sec_scores(pincodes.reset_index(), acc['bio_pincodes'].column).reset_index()
+        s.rows_out = len(sec_df)
+    return sec_df
+
+# ==========================================
+# PART 3: ROLLING PILLAR TRENDS
+# ==========================================
+# Scores over trailing windows, one row per (district, day, window), so the
+# dashboard can show whether a district is improving. Every window is a
+# difference of one cumulative sum over the district x day matrices that
+# final_clean.py writes (see matrix_store.py).
+
+TREND_WINDOWS = (7, 30, 90)
+TRENDS_PATH = 'pillar_trends'
+BIO_MATRIX = ('final_matrix_biometric', 'bio_age_5_17')
+ENROL_MATRIX = ('final_matrix_enrolment', 'age_5_17')
+
+def rolling_sums(matrix, window):
+    """Trailing `window`-day sums for every day that has a full window."""
+    totals = np.cumsum(np.pad(matrix, ((0, 0), (1, 0))), axis=1)
+    return totals[:, window:] - totals[:, :-window]
+
+def calculate_pillar_trends(sec_df, windows=TREND_WINDOWS, through=None, excess=(None, None)):
+    """
+    `excess` is the spike-excess matrix of the biometric grid rows and the
+    day of its first column (see calculate_batch_dumps); ALV blends in the
+    window's burst share when it is given.
+    """
+    print("\n📈 Rolling Pillar Trends...")
+    try:
+        bio_grid, enrol_grid = MatrixStore(BIO_MATRIX[0]), MatrixStore(ENROL_MATRIX[0])
+    except FileNotFoundError as exc:
+        print(f"⚠️  WARNING: {exc}")
+        return pd.DataFrame()
+
+    first = min(bio_grid.start, enrol_grid.start)
+    last = max(bio_grid.end, enrol_grid.end)
+    if through is not None:
+        last = min(last, np.datetime64(pd.Timestamp(through).date(), 'D'))
+    dates = pd.date_range(str(first), str(last), freq='D')
+    # Both grids on one day axis (views unless a grid starts late or ends early)
+    bio_m = bio_grid.window(BIO_MATRIX[1], first, last).astype('float64')
+    enrol_m = enrol_grid.window(ENROL_MATRIX[1], first, last).astype('float64')
+    # Same districts as the dashboard: MBCI needs both sides, while ALV is
+    # scaled against every district with biometric activity
+    districts = pd.Index(np.intersect1d(bio_grid.keys, enrol_grid.keys))
+    rows = bio_grid.rows(districts)
+    enrol_m = enrol_m[enrol_grid.rows(districts)]
+
+    # Spike excess on the same day axis (days it does not cover are 0)
+    excess_m = np.zeros_like(bio_m)
+    if excess[0] is not None:
+        lead = int((excess[1] - first).astype('int64'))
+        span = min(excess[0].shape[1], excess_m.shape[1] - lead)
+        excess_m[:, lead:lead + span] = excess[0][:, :span]
+
+    # SEC has no daily series (pincode totals span the feed): all-time value
+    sec = np.zeros(len(districts))
+    if not sec_df.empty:
+        sec = sec_df.set_index('district_id')['SEC_Score'].reindex(districts).fillna(0).to_numpy()
+
+    frames = []
+    for window in windows:
+        if window > len(dates):
+            continue
+        bio_sum = rolling_sums(bio_m, window)
+        enrol_sum = rolling_sums(enrol_m, window)
+
+        # MBCI: percentile rank of the window's ratio across districts, per day
+        mbci = pd.DataFrame(bio_sum[rows] / (enrol_sum + 1)).rank(pct=True).to_numpy() * 100
+
+        # ALV: std of daily volume inside the window, min-max scaled per day
+        if window > 1:
+            m2 = rolling_sums(bio_m ** 2, window) - bio_sum ** 2 / window
+            std = np.sqrt(np.clip(m2, 0, None) / (window - 1))
         else:
-            sec_score = 0
-        sec_results.append({'state': state, 'district': district, 'SEC_Score': sec_score})
-        
-    return pd.DataFrame(sec_results)
+            std = np.zeros_like(bio_sum)
+        max_std = std.max(axis=0)
+        alv = np.divide(std, max_std, out=np.zeros_like(std), where=max_std > 0)[rows] * 100
+        burst = np.divide(rolling_sums(excess_m, window), bio_sum,
+                          out=np.zeros_like(bio_sum), where=bio_sum > 0)[rows] * 100
+        alv = (1 - ALV_BURST_WEIGHT) * alv + ALV_BURST_WEIGHT * burst
+
+        w_mbci, w_alv, w_sec = PILLAR_WEIGHTS
+        samarth = w_mbci * mbci + w_alv * (100 - alv) + w_sec * sec[:, None]
+        n_days = mbci.shape[1]
+        frames.append(pd.DataFrame({
+            'date': np.tile(dates[window - 1:], len(districts)),
+            'district_id': np.repeat(districts.to_numpy(), n_days).astype(DISTRICT_ID_DTYPE),
+            'window_days': np.full(len(districts) * n_days, window, dtype='uint8'),
+            'MBCI_Score': mbci.ravel().astype('float32'),
+            'ALV_Score': alv.ravel().astype('float32'),
+            'SEC_Score': np.repeat(sec, n_days).astype('float32'),
+            'SAMARTH_Score': samarth.ravel().astype('float32'),
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
 
 # ==========================================
-# PART 3: MAIN EXECUTION
+# PART 4: BOOTSTRAP CONFIDENCE BANDS
 # ==========================================
+# A district with a few active days or a handful of pincodes gets a score
+# as precise-looking as a metro's. Each pillar is recomputed on resampled
+# days (MBCI, ALV) and resampled pincodes (SEC), for all districts at once
+# (see bootstrap_ci.py), and the central BOOTSTRAP_CI of the resampled
+# scores is reported as a band. Ranks and min-max scaling are redone inside
+# every resample, as the point scores do across districts.
+#
+# Two simplifications keep this a few matrix products per block:
+#   * Spike days are held fixed. Each drawn day brings its own excess from
+#     the one detection on the real series (detect_batch_dumps needs days
+#     in order, which a resample does not have). Burst shares vary only
+#     through which days are drawn, so ALV bands understate the uncertainty
+#     of the spike classification itself.
+#   * Days are drawn i.i.d. Autocorrelation (weekly cycles, backlogs that
+#     clear over several days) is ignored, so bands of strongly
+#     autocorrelated districts are too narrow.
+#
+# Days are drawn from BOOTSTRAP_SEED, once per resample for every district.
+# Pincodes are drawn per district, from a seed derived from its state and
+# district name, so a district's SEC band does not change when registry IDs
+# or the set of other districts do.
+
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_CI = 0.95
+BOOTSTRAP_SEED = 42
+# Resamples per batch (bounds the (districts, resamples) working arrays)
+BOOTSTRAP_BLOCK = 100
+BAND_PILLARS = ['MBCI', 'ALV', 'SEC', 'SAMARTH']
+
+def calculate_confidence_bands(master_df, pincodes, excess=(None, None), through=None,
+                               n_resamples=BOOTSTRAP_RESAMPLES, ci=BOOTSTRAP_CI, seed=BOOTSTRAP_SEED):
+    """
+    <Pillar>_Low / <Pillar>_High per district of `master_df` (MBCI, ALV,
+    SEC and SAMARTH), from the biometric/enrolment matrices, the spike
+    excess (see calculate_batch_dumps; held fixed per day, see above) and
+    the pincode volumes.
+    """
+    print("\n🎯 Bootstrap Confidence Bands...")
+    try:
+        bio_grid, enrol_grid = MatrixStore(BIO_MATRIX[0]), MatrixStore(ENROL_MATRIX[0])
+    except FileNotFoundError as exc:
+        print(f"⚠️  WARNING: {exc}")
+        return pd.DataFrame()
+
+    # Same days as the point ALV: the biometric grid, up to `through`
+    end = bio_grid.end
+    if through is not None:
+        end = min(end, np.datetime64(pd.Timestamp(through).date(), 'D'))
+    bio_m = bio_grid.window(BIO_MATRIX[1], None, end).astype('float64')
+    n_days = bio_m.shape[1]
+    if n_days < 2 or master_df.empty:
+        return pd.DataFrame()
+    bio_sq = bio_m ** 2
+    excess_m = excess[0] if excess[0] is not None else np.zeros_like(bio_m)
+
+    districts = master_df['district_id'].to_numpy()
+    rows = bio_grid.rows(districts)
+    # Enrolments on the same days are resampled with them; any outside the
+    # biometric grid stay fixed
+    enrol_m = enrol_grid.window(ENROL_MATRIX[1], bio_grid.start, end).astype('float64')[enrol_grid.rows(districts)]
+    enrol_fixed = master_df['age_5_17'].to_numpy('float64') - enrol_m.sum(axis=1)
+
+    # Pincode volumes sorted by district, then volume (as in gini_by_group)
+    starts = np.array([], dtype='int64')
+    if pincodes is not None and len(pincodes):
+        keys = pincodes.index.get_level_values('district_id').to_numpy()
+        values = pincodes.to_numpy('float64')
+        order = np.lexsort((values, keys))
+        keys, values = keys[order], values[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+        sec_rows = pd.Index(keys[starts]).get_indexer(districts)
+        # One stream per district, keyed by name: its draws do not move when
+        # other districts (or registry IDs) come and go
+        names = LocationRegistry().decode(pd.DataFrame({'district_id': keys[starts]}))
+        sec_rngs = [np.random.default_rng([seed, stable_seed(state, district)])
+                    for state, district in zip(names['state'], names['district'])]
+
+    # Days are drawn once for all districts (ranks and scaling compare them)
+    rng = np.random.default_rng(seed)
+    w_mbci, w_alv, w_sec = PILLAR_WEIGHTS
+    samples = {p: [] for p in BAND_PILLARS}
+    for lo in range(0, n_resamples, BOOTSTRAP_BLOCK):
+        block = min(BOOTSTRAP_BLOCK, n_resamples - lo)
+        # Resampled days as counts: every resampled sum is one matrix product
+        w = multinomial_weights(rng, n_days, block).T.astype('float64')
+        s1, s2 = bio_m @ w, bio_sq @ w
+
+        std = np.sqrt(np.clip(s2 - s1 ** 2 / n_days, 0, None) / (n_days - 1))
+        max_std = std.max(axis=0)
+        vol = np.divide(std, max_std, out=np.zeros_like(std), where=max_std > 0) * 100
+        # Spike days stay as detected; only which of them are drawn varies
+        burst = np.divide(excess_m @ w, s1, out=np.zeros_like(s1), where=s1 > 0) * 100
+        alv = ((1 - ALV_BURST_WEIGHT) * vol + ALV_BURST_WEIGHT * burst)[rows]
+
+        ratio = s1[rows] / (enrol_m @ w + enrol_fixed[:, None] + 1)
+        mbci = pd.DataFrame(ratio).rank(pct=True).to_numpy() * 100
+
+        sec = np.zeros((len(districts), block))
+        if len(starts):
+            gini = weighted_gini_by_group(values, group_resample_weights(sec_rngs, starts, sizes, block), starts, sizes)
+            scores = np.where((sizes > 1) & np.isfinite(gini), 100 * (1 - gini), 0.0).T
+            has_pins = sec_rows >= 0
+            sec[has_pins] = scores[sec_rows[has_pins]]
+
+        samples['MBCI'].append(mbci)
+        samples['ALV'].append(alv)
+        samples['SEC'].append(sec)
+        samples['SAMARTH'].append(w_mbci * mbci + w_alv * (100 - alv) + w_sec * sec)
 
-master_df = calculate_mbci_alv_realistic()
-sec_df = calculate_sec_realistic()
+    q = [50 * (1 - ci), 50 * (1 + ci)]
+    bands = pd.DataFrame({'district_id': districts})
+    for pillar in BAND_PILLARS:
+        low, high = np.percentile(np.hstack(samples[pillar]), q, axis=1)
+        bands[f'{pillar}_Low'], bands[f'{pillar}_High'] = low, high
+    return bands
+
+# ==========================================
+# PART 5: MAIN EXECUTION
+# ==========================================
+
+DASHBOARD_PATH = 'aadhaar_hackathon_final_dashboard.csv'
+
+def build_dashboard(update=False, through=None):
+    """
+    Scans (or, with `update`, extends) the metric state and writes the
+    dashboard CSV and the rolling trends. Returns the dashboard, or None.
+    """
+    engine = MetricEngine(pillar_accumulators())
+    if update and engine.load():
+        # Daily refresh: only new days are read, the rest comes from saved state
+        print("♻️  Folding new days into saved metric state...")
+        engine.update(chunksize=METRIC_CHUNK_SIZE, end=through)
+    else:
+        # One scan per store feeds every pillar
+        engine.scan(chunksize=METRIC_CHUNK_SIZE, end=through)
+    engine.save()
+    acc = engine.accumulators
+
+    spikes, excess, excess_start = calculate_batch_dumps(through)
+    master_df = calculate_mbci_alv_realistic(acc, spikes)
+    sec_df = calculate_sec_realistic(acc)
+
+    if master_df.empty:
+        print("❌ Process Failed.")
+        return None
 
-if not master_df.empty:
     print("\n🔗 Merging & Generating Final Report...")
     if not sec_df.empty:
-        final_dashboard = pd.merge(master_df, sec_df[['state', 'district', 'SEC_Score']], 
-                                   on=['state', 'district'], how='left')
+        final_dashboard = pd.merge(master_df, sec_df[['district_id', 'SEC_Score']], 
+                                   on='district_id', how='left')
         final_dashboard['SEC_Score'] = final_dashboard['SEC_Score'].fillna(0)
     else:
         final_dashboard = master_df
         final_dashboard['SEC_Score'] = 0
 
+    with step('confidence_bands', rows_in=len(final_dashboard), n_resamples=BOOTSTRAP_RESAMPLES) as s:
+        bands = calculate_confidence_bands(final_dashboard, acc['bio_pincodes'].result(),
+                                           excess=(excess, excess_start), through=through)
+        s.rows_out = len(bands)
+    band_cols = [f'{p}_{side}' for p in BAND_PILLARS for side in ('Low', 'High')]
+    if bands.empty:
+        final_dashboard[band_cols] = np.nan
+    else:
+        final_dashboard = final_dashboard.merge(bands, on='district_id', how='left')
+
     # Final Polish
-    final_cols = ['state', 'district', 'MBCI_Score', 'ALV_Score', 'SEC_Score', 'Raw_Ratio', 'Load_Volatility_StdDev']
+    registry = LocationRegistry()
+    final_dashboard = registry.decode(final_dashboard)
+
+    # Every level down to pincodes, precomputed for the dashboard's lookups
+    with step('rollup_cube', rows_in=len(final_dashboard)) as s:
+        cube = build_rollup_cube(final_dashboard, registry.decode(pincode_volumes(acc).reset_index()))
+        write_cube(cube)
+        s.rows_out = len(cube)
+    print(f"🧊 Rollup cube ({len(cube)} rows) saved to: {CUBE_PATH}")
+    final_cols = ['state', 'district', 'MBCI_Score', 'ALV_Score', 'SEC_Score', 'Raw_Ratio', 'Load_Volatility_StdDev',
+                  'Spike_Days', 'Spike_Volume_Share', 'Burst_Score'] + band_cols
     final_dashboard = final_dashboard[final_cols]
-    
-    output_file = 'aadhaar_hackathon_final_dashboard.csv'
-    final_dashboard.to_csv(output_file, index=False)
-    
-    print(f"\n✅ COMPLETE. Real-world insights generated in: {output_file}")
+
+    final_dashboard.to_csv(DASHBOARD_PATH, index=False)
+
+    print(f"\n✅ COMPLETE. Real-world insights generated in: {DASHBOARD_PATH}")
     print(final_dashboard.head(10))
-else:
-    print("❌ Process Failed.")
\ No newline at end of file
+
+    with step('pillar_trends') as s:
+        trends = calculate_pillar_trends(sec_df, through=through, excess=(excess, excess_start))
+        s.rows_out = len(trends)
+    if not trends.empty:
+        write_store(LocationRegistry().decode(trends), TRENDS_PATH)
+        print(f"💾 Trends ({len(trends)} rows) saved to: {TRENDS_PATH}")
+    return final_dashboard
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the MBCI / ALV / SEC dashboard.")
+    parser.add_argument('--update', action='store_true',
+                        help="fold only the days after the saved metric state into it")
+    parser.add_argument('--through', help="last date to fold in (YYYY-MM-DD); default: all")
+    args = parser.parse_args()
+    # Per-step timings, memory and drop counts (see telemetry.py)
+    start_run('calculate_metrics')
+    try:
+        build_dashboard(update=args.update, through=args.through)
+    finally:
+        # Failed runs keep their steps (status names the exception)
+        save_report()
@@ -0,0 +1,297 @@
+import json
+import os
+
+from lazy_imports import lazy_import
+
+difflib = lazy_import('difflib')
+futures = lazy_import('concurrent.futures')
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+sparse = lazy_import('scipy.sparse')
+
+# ==========================================
+# 1. THE GOLD STANDARD (The "Law")
+# ==========================================
+# All data MUST fall into these buckets. No exceptions.
+OFFICIAL_STATES = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa", 
+    "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala", 
+    "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland", 
+    "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura", 
+    "Uttar Pradesh", "Uttarakhand", "West Bengal"
+]
+
+OFFICIAL_UTS = [
+    "Andaman and Nicobar Islands", "Chandigarh", "Dadra and Nagar Haveli and Daman & Diu", 
+    "Delhi (NCT)", "Jammu & Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
+]
+
+TARGET_LOCATIONS = OFFICIAL_STATES + OFFICIAL_UTS
+
+# Manual Override Dictionary 
+# Maps known bad variations to the Official Name immediately (bypassing fuzzy match risks)
+MANUAL_MAP = {
+    'Nct Of Delhi': 'Delhi (NCT)',
+    'Delhi': 'Delhi (NCT)',
+    'New Delhi': 'Delhi (NCT)',
+    'Dadra And Nagar Haveli': 'Dadra and Nagar Haveli and Daman & Diu',
+    'Daman And Diu': 'Dadra and Nagar Haveli and Daman & Diu',
+    'The Dadra And Nagar Haveli And Daman And Diu': 'Dadra and Nagar Haveli and Daman & Diu',
+    'Dadra & Nagar Haveli': 'Dadra and Nagar Haveli and Daman & Diu',
+    'Jammu And Kashmir': 'Jammu & Kashmir',
+    'West Bangal': 'West Bengal',
+    'Westbengal': 'West Bengal',
+    'West  Bengal': 'West Bengal',
+    'Chhatisgarh': 'Chhattisgarh',
+    'Tamilnadu': 'Tamil Nadu',
+    'Orissa': 'Odisha',
+    'Pondicherry': 'Puducherry',
+    'Uttaranchal': 'Uttarakhand',
+    'Ladhak': 'Ladakh'
+}
+
+# ==========================================
+# 2. THE CLEANING ENGINES
+# ==========================================
+
+# Persistent alias table: raw spelling -> official name, for spellings that
+# needed the fuzzy "Magnet". Later runs resolve them without difflib.
+ALIAS_TABLE_PATH = 'state_aliases.json'
+
+def get_clean_state(name):
+    """
+    Forces a state name to match the Gold Standard.
+    """
+    if pd.isna(name):
+        return "UNKNOWN"
+    
+    # 1. Syntactic Scrub
+    clean = str(name).strip().title()
+    
+    # 2. Check Manual Map (Fast Path)
+    # Check lowercase to be safe
+    for bad_key, good_val in MANUAL_MAP.items():
+        if bad_key.lower() == clean.lower():
+            return good_val
+            
+    # 3. Check if already perfect
+    for target in TARGET_LOCATIONS:
+        if target.lower() == clean.lower():
+            return target
+            
+    # 4. Fuzzy Force Match (The "Magnet")
+    # Finds the closest official state name. 
+    # Cutoff 0.6 allows matching "Telengana" -> "Telangana"
+    matches = difflib.get_close_matches(clean, TARGET_LOCATIONS, n=1, cutoff=0.6)
+    
+    if matches:
+        return matches[0] # Return the official spelling
+    
+    return "UNKNOWN" # Mark for deletion
+
+class StateCanonicalizer:
+    """
+    Memoized get_clean_state for whole columns.
+    Each distinct raw spelling is resolved once: prebuilt lowercase index
+    (Manual Map, then Gold Standard), then the alias table, then fuzzy match.
+    """
+    def __init__(self, alias_path=ALIAS_TABLE_PATH):
+        self.alias_path = alias_path
+        # Manual Map wins over the Gold Standard, first key wins, as in get_clean_state
+        self.index = {}
+        for bad_key, good_val in MANUAL_MAP.items():
+            self.index.setdefault(bad_key.lower(), good_val)
+        for target in TARGET_LOCATIONS:
+            self.index.setdefault(target.lower(), target)
+
+        # Aliases learned against a different Gold Standard are discarded
+        self.signature = '|'.join(TARGET_LOCATIONS)
+        self.aliases = {}
+        self._dirty = False
+        if alias_path and os.path.exists(alias_path):
+            with open(alias_path) as fh:
+                data = json.load(fh)
+            if data.get('signature') == self.signature:
+                self.aliases = data['aliases']
+
+    def resolve(self, name):
+        """Canonical name for one spelling (same answers as get_clean_state)."""
+        if pd.isna(name):
+            return "UNKNOWN"
+        clean = str(name).strip().title()
+        key = clean.lower()
+        if key in self.index:
+            return self.index[key]
+        if clean not in self.aliases:
+            matches = difflib.get_close_matches(clean, TARGET_LOCATIONS, n=1, cutoff=0.6)
+            self.aliases[clean] = matches[0] if matches else "UNKNOWN"
+            self._dirty = True
+        return self.aliases[clean]
+
+    def canonicalize(self, series):
+        """Vectorized: resolves the distinct values and maps them back."""
+        codes, uniques = pd.factorize(series)
+        resolved = np.array([self.resolve(u) for u in uniques] + ["UNKNOWN"], dtype=object)
+        return pd.Series(resolved[codes], index=series.index, name=series.name)
+
+    def save(self):
+        if not (self._dirty and self.alias_path):
+            return
+        tmp = f"{self.alias_path}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump({'signature': self.signature, 'aliases': self.aliases}, fh, indent=1, sort_keys=True)
+        os.replace(tmp, self.alias_path)
+        self._dirty = False
+
+
+# Candidate pools at least this large are verified with a sparse product
+SPARSE_POOL_MIN = 256
+
+def _bigram_tokens(text):
+    """Bigrams as a set of (bigram, occurrence) tokens, so set overlap = multiset overlap."""
+    seen = {}
+    tokens = []
+    for i in range(len(text) - 1):
+        g = text[i:i + 2]
+        seen[g] = seen.get(g, 0) + 1
+        tokens.append((g, seen[g]))
+    return tokens
+
+def cluster_district_spellings(districts, cutoff=0.85, n=10):
+    """
+    Leader/minion clustering of district spellings, most frequent first.
+    Gives exactly the mapping of running difflib.get_close_matches against
+    every spelling, but only candidates that pass a character-bigram block
+    get the SequenceMatcher check.
+
+    Blocking bound: if ratio(a, b) >= r, the matching blocks cover
+    M >= r*T/2 characters (T = len(a) + len(b)) in at most 1 + T - 2M
+    blocks, so a and b share at least (1.5*r - 1)*T - 1 bigrams and
+    2*min(len) >= r*T. Pairs failing either test can never match.
+    Candidates come from a prefix-filter index over the rarest bigrams,
+    so common bigrams like 'ur' or 'pu' are never scanned, and the
+    overlap test runs as one sparse product per leader.
+    """
+    tokens = [_bigram_tokens(d) for d in districts]
+    token_sets = [set(t) for t in tokens]
+    lengths = np.array([len(d) for d in districts], dtype=np.int64)
+
+    slope = 1.5 * cutoff - 1
+    eps = 1e-9
+
+    def min_overlap(length):
+        # Overlap any admissible partner needs (its length >= length*r/(2-r))
+        return max(1, int(np.ceil(slope * length * 2 / (2 - cutoff) - 1 - eps)))
+
+    # Token incidence matrix: overlap(a, b) is one sparse row product
+    frequency = {}
+    for toks in tokens:
+        for tok in toks:
+            frequency[tok] = frequency.get(tok, 0) + 1
+    token_ids = {tok: k for k, tok in enumerate(frequency)}
+    rows = np.repeat(np.arange(len(tokens)), [len(t) for t in tokens])
+    cols = np.array([token_ids[tok] for toks in tokens for tok in toks], dtype=np.int64)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.int32), (rows, cols)), shape=(len(tokens), len(token_ids))
+    )
+
+    # Global order: rarest tokens first. Each spelling is indexed by its
+    # prefix only; two spellings sharing t tokens share a prefix token.
+    prefixes = []
+    postings = {}
+    for i, toks in enumerate(tokens):
+        toks.sort(key=lambda tok: (frequency[tok], tok))
+        prefix = [token_ids[tok] for tok in toks[:max(len(toks) - min_overlap(lengths[i]) + 1, 0)]]
+        prefixes.append(prefix)
+        for k in prefix:
+            postings.setdefault(k, []).append(i)
+    postings = {k: np.array(v, dtype=np.int64) for k, v in postings.items()}
+    by_length = {
+        length: np.flatnonzero(lengths == length) for length in np.unique(lengths)
+    }
+
+    def candidates(q):
+        lq = lengths[q]
+        # SequenceMatcher's autojunk kicks in at 200 chars: no blocking there
+        if lq >= 200 or slope <= 0:
+            return districts
+
+        # Partners short enough that the bound needs no shared bigram
+        min_len = lq * cutoff / (2 - cutoff)
+        parts = [
+            members for length, members in by_length.items()
+            if length >= 200 or (length >= min_len - eps and slope * (lq + length) - 1 - eps <= 0)
+        ]
+        parts += [postings[k] for k in prefixes[q]]
+        if not parts:
+            return []
+        pool = np.unique(np.concatenate(parts))
+
+        other = lengths[pool]
+        total = lq + other
+        if len(pool) < SPARSE_POOL_MIN:
+            mine = token_sets[q]
+            overlap = np.array([len(mine & token_sets[i]) for i in pool])
+        else:
+            overlap = (incidence[pool] @ incidence[q].T).toarray().ravel()
+        keep = (2 * np.minimum(lq, other) >= cutoff * total - eps) & (
+            (other >= 200) | (overlap >= slope * total - 1 - eps)
+        )
+        return [districts[i] for i in pool[keep]]
+
+    mapping = {}
+    processed = set()
+    for q, dist in enumerate(districts):
+        if dist in processed:
+            continue
+
+        # This district is now a "Cluster Leader"
+        mapping[dist] = dist
+        processed.add(dist)
+
+        # Find its "Minions" (misspellings) among the plausible candidates
+        # cutoff=0.85 ensures we don't merge different districts (e.g. Rampur vs Hamirpur)
+        matches = difflib.get_close_matches(dist, candidates(q), n=n, cutoff=cutoff)
+        for match in matches:
+            if match not in processed:
+                mapping[match] = dist # Map misspelling to Leader
+                processed.add(match)
+
+    return mapping
+
+def clean_districts_in_state(df_state):
+    """
+    Clusters similar district names WITHIN a state.
+    Example: Merges 'Ananthapur', 'Anantapur' -> 'Anantapur'
+    """
+    # Get all unique district spellings in this state, most frequent first
+    districts = df_state['district'].value_counts().index.tolist()
+    mapping = cluster_district_spellings(districts)
+    return df_state['district'].map(mapping)
+
+def district_cluster_map(counts, workers=None):
+    """
+    Canonical district for every (state, district) spelling.
+    `counts` holds row counts indexed by (state, district) in order of first
+    appearance, so nothing but these counts is needed to cluster. Each
+    state's spellings are clustered, in a process pool when workers > 1.
+    Returns the canonical names aligned with `counts.index`.
+    """
+    # Spellings per state, ordered exactly like df_state['district'].value_counts()
+    states = counts.index.get_level_values('state')
+    jobs = []
+    for state in pd.unique(states):
+        sub = counts[states == state].droplevel('state')
+        jobs.append(sub.sort_values(ascending=False).index.tolist())
+
+    if workers and workers > 1 and len(jobs) > 1:
+        with futures.ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            mappings = list(pool.map(cluster_district_spellings, jobs))
+    else:
+        mappings = [cluster_district_spellings(spellings) for spellings in jobs]
+
+    canonical = {}
+    for state, mapping in zip(pd.unique(states), mappings):
+        for spelling, leader in mapping.items():
+            canonical[(state, spelling)] = leader
+    return [canonical[key] for key in counts.index]
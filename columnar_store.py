@@ -0,0 +1,182 @@
+import os
+import shutil
+import uuid
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+pa = lazy_import('pyarrow')
+ds = lazy_import('pyarrow.dataset')
+pq = lazy_import('pyarrow.parquet')
+
+# ==========================================
+# COLUMNAR INTERMEDIATE STORE
+# ==========================================
+# Stage hand-offs are Parquet datasets partitioned by state and month:
+#   final_cleaned_biometric/state=Bihar/month=2025-03/<part>.parquet
+# Columns keep their dtypes between stages, and readers push column
+# projections and state/date filters down to the files.
+
+PARTITION_COLS = ['state', 'month']
+
+
+def _partitioned(df):
+    """The frame with its 'month' column added, and the partition columns it uses."""
+    df = df.copy()
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+        df['month'] = df['date'].dt.strftime('%Y-%m')
+    return df, [c for c in PARTITION_COLS if c in df.columns]
+
+
+def write_store(df, path):
+    """
+    Writes a frame as a partitioned Parquet store, replacing any old one.
+    Partitions on 'state' and on the calendar month of 'date' when present.
+    """
+    df, partition_cols = _partitioned(df)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(table, path, partition_cols=partition_cols or None)
+
+
+def replace_months(df, path, first_month):
+    """
+    Replaces every month from `first_month` ('YYYY-MM') on in the dated
+    store at `path` with the rows of `df`, which hold only those months.
+    Earlier partitions are left untouched.
+    """
+    for state_dir in os.listdir(path):
+        state_path = os.path.join(path, state_dir)
+        if not os.path.isdir(state_path):
+            continue
+        for month_dir in os.listdir(state_path):
+            if month_dir.startswith('month=') and month_dir[len('month='):] >= first_month:
+                shutil.rmtree(os.path.join(state_path, month_dir))
+        if not os.listdir(state_path):
+            os.rmdir(state_path)
+    if len(df):
+        df, partition_cols = _partitioned(df)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Fresh file names: the kept partitions' files stay as they are
+        pq.write_to_dataset(table, path, partition_cols=partition_cols,
+                            existing_data_behavior='overwrite_or_ignore',
+                            basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet")
+
+
+def store_dtypes(path, columns):
+    """NumPy dtypes of `columns` in the store at `path`."""
+    schema = open_store(path).schema
+    return {col: np.dtype(schema.field(col).type.to_pandas_dtype()) for col in columns}
+
+
+def _store_filter(states=None, start=None, end=None, partitions=()):
+    """Builds the pushdown expression; month bounds prune whole folders."""
+    expr = None
+
+    def _and(e):
+        return e if expr is None else expr & e
+
+    if states is not None:
+        expr = _and(ds.field('state').isin(list(states)))
+    if start is not None:
+        start = pd.Timestamp(start)
+        if 'month' in partitions:
+            expr = _and(ds.field('month') >= start.strftime('%Y-%m'))
+        expr = _and(ds.field('date') >= start)
+    if end is not None:
+        end = pd.Timestamp(end)
+        if 'month' in partitions:
+            expr = _and(ds.field('month') <= end.strftime('%Y-%m'))
+        expr = _and(ds.field('date') <= end)
+    return expr
+
+
+def open_store(path):
+    return ds.dataset(path, format='parquet', partitioning='hive')
+
+
+def read_store(path, columns=None, states=None, start=None, end=None):
+    """
+    Reads a store with projection and filter pushdown.
+    Only the requested columns of the matching state/month files are read.
+    """
+    dataset = open_store(path)
+    partitions = dataset.partitioning.schema.names if dataset.partitioning else []
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c != 'month']
+    table = dataset.to_table(
+        columns=list(columns),
+        filter=_store_filter(states, start, end, partitions)
+    )
+    return table.to_pandas()
+
+
+def load_frame(stem, columns=None, states=None, start=None, end=None):
+    """
+    Loads a stage output: the Parquet store at `stem` if it exists,
+    else the legacy `stem.csv` (filters applied after parsing).
+    Raises FileNotFoundError if neither exists.
+    """
+    if os.path.isdir(stem):
+        return read_store(stem, columns=columns, states=states, start=start, end=end)
+
+    df = pd.read_csv(f"{stem}.csv", usecols=columns)
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+        if start is not None:
+            df = df[df['date'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['date'] <= pd.Timestamp(end)]
+    if states is not None:
+        df = df[df['state'].isin(list(states))]
+    return df
+
+
+def iter_frames(stem, columns=None, batch_size=None, start=None, end=None):
+    """
+    Like load_frame, but yields the stage output in frames of at most
+    `batch_size` rows (one frame when None), so callers can fold it
+    out of core. Raises FileNotFoundError up front if nothing exists.
+    """
+    if not os.path.isdir(stem) and not os.path.exists(f"{stem}.csv"):
+        raise FileNotFoundError(f"No store or CSV found for '{stem}'")
+    if batch_size is None:
+        return iter([load_frame(stem, columns=columns, start=start, end=end)])
+    return _iter_batches(stem, columns, batch_size, start, end)
+
+
+def _iter_batches(stem, columns, batch_size, start, end):
+    if os.path.isdir(stem):
+        dataset = open_store(stem)
+        partitions = dataset.partitioning.schema.names if dataset.partitioning else []
+        if columns is None:
+            columns = [c for c in dataset.schema.names if c != 'month']
+        batches = dataset.to_batches(
+            columns=list(columns),
+            filter=_store_filter(None, start, end, partitions),
+            batch_size=batch_size
+        )
+        # Each file yields its own batches, and a store has one file per
+        # state/month, so small batches are joined up to batch_size rows.
+        pending, rows = [], 0
+        for batch in batches:
+            if pending and rows + batch.num_rows > batch_size:
+                yield pa.Table.from_batches(pending).to_pandas()
+                pending, rows = [], 0
+            pending.append(batch)
+            rows += batch.num_rows
+        if pending:
+            yield pa.Table.from_batches(pending).to_pandas()
+        return
+
+    for chunk in pd.read_csv(f"{stem}.csv", usecols=columns, chunksize=batch_size):
+        if 'date' in chunk.columns:
+            chunk['date'] = pd.to_datetime(chunk['date'])
+            if start is not None:
+                chunk = chunk[chunk['date'] >= pd.Timestamp(start)]
+            if end is not None:
+                chunk = chunk[chunk['date'] <= pd.Timestamp(end)]
+        yield chunk
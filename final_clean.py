@@ -1,166 +1,199 @@
-import pandas as pd
-import difflib
 import os
 
+from lazy_imports import lazy_import
+from columnar_store import iter_frames, load_frame, write_store
+from location_registry import LocationRegistry, compact_counts
+from matrix_store import write_matrix_store
+from cleaning_engines import StateCanonicalizer, district_cluster_map
+from telemetry import save_report, start_run, step
+
+pd = lazy_import('pandas')
+
+# Processes for per-state district clustering (1 = serial)
+CLUSTER_WORKERS = os.cpu_count() or 1
+
+# Out-of-core Mode: rows read per input chunk. Memory is bounded by the
+# number of (date, district) keys. Set to None to load inputs whole.
+FINAL_CHUNK_SIZE = 1_000_000
+
+# Fold the per-chunk partial sums together after this many chunks
+FOLD_EVERY = 16
+
 # ==========================================
-# 1. THE GOLD STANDARD (The "Law")
+# 1. THE GOLD STANDARD & CLEANING ENGINES
 # ==========================================
-# All data MUST fall into these buckets. No exceptions.
-OFFICIAL_STATES = [
-    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa", 
-    "Gujarat", "Haryana", "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala", 
-    "Madhya Pradesh", "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland", 
-    "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana", "Tripura", 
-    "Uttar Pradesh", "Uttarakhand", "West Bengal"
-]
-
-OFFICIAL_UTS = [
-    "Andaman and Nicobar Islands", "Chandigarh", "Dadra and Nagar Haveli and Daman & Diu", 
-    "Delhi (NCT)", "Jammu & Kashmir", "Ladakh", "Lakshadweep", "Puducherry"
-]
-
-TARGET_LOCATIONS = OFFICIAL_STATES + OFFICIAL_UTS
-
-# Manual Override Dictionary 
-# Maps known bad variations to the Official Name immediately (bypassing fuzzy match risks)
-MANUAL_MAP = {
-    'Nct Of Delhi': 'Delhi (NCT)',
-    'Delhi': 'Delhi (NCT)',
-    'New Delhi': 'Delhi (NCT)',
-    'Dadra And Nagar Haveli': 'Dadra and Nagar Haveli and Daman & Diu',
-    'Daman And Diu': 'Dadra and Nagar Haveli and Daman & Diu',
-    'The Dadra And Nagar Haveli And Daman And Diu': 'Dadra and Nagar Haveli and Daman & Diu',
-    'Dadra & Nagar Haveli': 'Dadra and Nagar Haveli and Daman & Diu',
-    'Jammu And Kashmir': 'Jammu & Kashmir',
-    'West Bangal': 'West Bengal',
-    'Westbengal': 'West Bengal',
-    'West  Bengal': 'West Bengal',
-    'Chhatisgarh': 'Chhattisgarh',
-    'Tamilnadu': 'Tamil Nadu',
-    'Orissa': 'Odisha',
-    'Pondicherry': 'Puducherry',
-    'Uttaranchal': 'Uttarakhand',
-    'Ladhak': 'Ladakh'
-}
+# OFFICIAL_STATES, OFFICIAL_UTS, TARGET_LOCATIONS, MANUAL_MAP and the
+# state / district engines live in cleaning_engines.py.
 
 # ==========================================
-# 2. THE CLEANING ENGINES
+# 2. DATASET PROCESSING
 # ==========================================
 
-def get_clean_state(name):
+def process_dataset(filepath, value_cols, registry, states=None, chunksize=None):
     """
-    Forces a state name to match the Gold Standard.
+    Returns the cleaned district frame and the alias table it learned:
+    every (raw_state, raw_district) spelling with its canonical district.
+    With a chunksize the input is never held whole: a first pass counts
+    location spellings, a second folds chunks into (date, district) sums,
+    so memory is bounded by the number of keys, not rows.
     """
-    if pd.isna(name):
-        return "UNKNOWN"
-    
-    # 1. Syntactic Scrub
-    clean = str(name).strip().title()
-    
-    # 2. Check Manual Map (Fast Path)
-    # Check lowercase to be safe
-    for bad_key, good_val in MANUAL_MAP.items():
-        if bad_key.lower() == clean.lower():
-            return good_val
-            
-    # 3. Check if already perfect
-    for target in TARGET_LOCATIONS:
-        if target.lower() == clean.lower():
-            return target
-            
-    # 4. Fuzzy Force Match (The "Magnet")
-    # Finds the closest official state name. 
-    # Cutoff 0.6 allows matching "Telengana" -> "Telangana"
-    matches = difflib.get_close_matches(clean, TARGET_LOCATIONS, n=1, cutoff=0.6)
-    
-    if matches:
-        return matches[0] # Return the official spelling
+    print(f"🔄 Processing: {filepath}")
     
-    return "UNKNOWN" # Mark for deletion
+    try:
+        # Parquet store if present, else the legacy CSV
+        frames = iter_frames(filepath, columns=['state', 'district'], batch_size=chunksize)
+    except FileNotFoundError:
+        print(f"❌ Error: File {filepath} not found.")
+        return None, None
 
-def clean_districts_in_state(df_state):
-    """
-    Clusters similar district names WITHIN a state.
-    Example: Merges 'Ananthapur', 'Anantapur' -> 'Anantapur'
-    """
-    # Get all unique district spellings in this state
-    districts = df_state['district'].value_counts().index.tolist()
-    
-    mapping = {}
-    processed = set()
-    
-    for dist in districts:
-        if dist in processed:
-            continue
+    with step('process_dataset', dataset=filepath) as run:
+        # --- PASS 1: LOCATION SPELLINGS ---
+        # Row counts per raw (state, district), in order of first appearance
+        with step('location_pass', dataset=filepath) as s:
+            initial_rows = 0
+            counts = []
+            for chunk in frames:
+                initial_rows += len(chunk)
+                counts.append(chunk.groupby([chunk['state'].astype(str), 'district'], sort=False).size())
+            counts = _fold_sums(counts, sort=False)
+            s.rows_in, s.rows_out = initial_rows, len(counts)
+        run.rows_in = initial_rows
+        
+        # --- STEP 1: STATE STANDARDIZATION ---
+        print("   ... Normalizing States")
+        with step('state_standardization', rows_in=initial_rows, dataset=filepath, spellings=len(counts)) as s:
+            # One lookup per distinct spelling, fuzzy results cached on disk
+            states = states or StateCanonicalizer()
+            aliases = counts.index.to_frame(index=False, name=['raw_state', 'raw_district'])
+            aliases['state'] = states.canonicalize(aliases['raw_state']).to_numpy()
             
-        # This district is now a "Cluster Leader"
-        mapping[dist] = dist
-        processed.add(dist)
+            # Drop rows that couldn't be matched to ANY state (Garbage)
+            known = (aliases['state'] != "UNKNOWN").to_numpy()
+            aliases = aliases[known].reset_index(drop=True)
+            s.drops['unknown_state'] = int(counts.to_numpy()[~known].sum())
+            s.rows_out = initial_rows - s.drops['unknown_state']
         
-        # Find its "Minions" (misspellings)
-        # cutoff=0.85 ensures we don't merge different districts (e.g. Rampur vs Hamirpur)
-        matches = difflib.get_close_matches(dist, districts, n=10, cutoff=0.85)
+        # --- STEP 2: DISTRICT CLUSTERING ---
+        print("   ... Clustering Districts")
+        with step('district_clustering', rows_in=len(aliases), dataset=filepath, workers=CLUSTER_WORKERS) as s:
+            # We apply this state-by-state to avoid cross-state errors.
+            # States are independent, so they are clustered in parallel.
+            state_counts = pd.Series(
+                counts.to_numpy()[known],
+                index=pd.MultiIndex.from_frame(aliases[['state', 'raw_district']], names=['state', 'district'])
+            )
+            state_counts = _fold_sums([state_counts], sort=False)
+            leaders = pd.Series(district_cluster_map(state_counts, workers=CLUSTER_WORKERS), index=state_counts.index)
+            aliases['district'] = leaders.reindex(pd.MultiIndex.from_frame(aliases[['state', 'raw_district']])).to_numpy()
+            aliases = registry.encode(aliases)
+            s.rows_out = aliases['district_id'].nunique()
         
-        for match in matches:
-            if match not in processed:
-                mapping[match] = dist # Map misspelling to Leader
-                processed.add(match)
-                
-    return df_state['district'].map(mapping)
-
-def process_dataset(filepath, value_cols):
-    print(f"🔄 Processing: {filepath}")
+        # --- STEP 3: RE-AGGREGATION (Critical) ---
+        # Merging "Westbengal" -> "West Bengal" creates duplicate dates. We must Sum them.
+        print("   ... Re-aggregating Data")
+        with step('reaggregation', rows_in=initial_rows, dataset=filepath) as s:
+            # Group on compact integer IDs rather than the name strings
+            partials = []
+            kept = 0
+            for chunk in iter_frames(filepath, columns=['date', 'state', 'district'] + value_cols, batch_size=chunksize):
+                chunk = _attach_district_ids(chunk, aliases)
+                kept += len(chunk)
+                partials.append(chunk.groupby(['date', 'district_id'])[value_cols].sum())
+                if len(partials) >= FOLD_EVERY:
+                    partials = [_fold_sums(partials)]
+            df_final = _fold_sums(partials).reset_index()
+            df_final = registry.decode(df_final)
+            df_final = compact_counts(df_final[['date', 'state', 'district', 'state_id', 'district_id'] + value_cols], value_cols)
+            s.rows_out = len(df_final)
+            s.drops['unknown_state'] = initial_rows - kept
+        run.rows_out = len(df_final)
+        run.drops.update(s.drops)
     
+    print(f"✅ Done. Rows: {initial_rows} -> {len(df_final)}")
+    return df_final, aliases[['raw_state', 'raw_district', 'state', 'district', 'state_id', 'district_id']]
+
+def _fold_sums(partials, sort=True):
+    """Merges partial sums that share an index into one."""
+    partials = pd.concat(partials)
+    return partials.groupby(level=list(range(partials.index.nlevels)), sort=sort).sum()
+
+def _attach_district_ids(df, aliases):
+    """Adds 'district_id' from the alias table; unknown spellings are dropped."""
+    keys = pd.MultiIndex.from_frame(aliases[['raw_state', 'raw_district']])
+    pos = keys.get_indexer(pd.MultiIndex.from_arrays([df['state'].astype(str), df['district']]))
+    hit = pos >= 0
+    return df[hit].assign(district_id=aliases['district_id'].to_numpy()[pos[hit]])
+
+def apply_aliases(filepath, value_cols, aliases):
+    """
+    Re-keys the pincode totals from preprocessing onto canonical districts,
+    using the aliases learned by process_dataset. Spellings without an alias
+    (unmatched states) are dropped, exactly as in the district frame.
+    """
     try:
-        df = pd.read_csv(filepath)
+        pincodes = load_frame(filepath)
     except FileNotFoundError:
-        print(f"❌ Error: File {filepath} not found.")
+        print(f"⚠️  WARNING: Pincode totals {filepath} not found.")
         return None
 
-    initial_rows = len(df)
-    
-    # --- STEP 1: STATE STANDARDIZATION ---
-    print("   ... Normalizing States")
-    df['state'] = df['state'].apply(get_clean_state)
-    
-    # Drop rows that couldn't be matched to ANY state (Garbage)
-    df = df[df['state'] != "UNKNOWN"]
-    
-    # --- STEP 2: DISTRICT CLUSTERING ---
-    print("   ... Clustering Districts")
-    # We apply this state-by-state to avoid cross-state errors
-    cleaned_frames = []
-    for state_name in df['state'].unique():
-        state_subset = df[df['state'] == state_name].copy()
-        state_subset['district'] = clean_districts_in_state(state_subset)
-        cleaned_frames.append(state_subset)
-        
-    df = pd.concat(cleaned_frames)
-    
-    # --- STEP 3: RE-AGGREGATION (Critical) ---
-    # Merging "Westbengal" -> "West Bengal" creates duplicate dates. We must Sum them.
-    print("   ... Re-aggregating Data")
-    df_final = df.groupby(['date', 'state', 'district'])[value_cols].sum().reset_index()
-    
-    print(f"✅ Done. Rows: {initial_rows} -> {len(df_final)}")
-    return df_final
+    with step('apply_aliases', rows_in=len(pincodes), dataset=filepath) as s:
+        pincodes = _attach_district_ids(pincodes, aliases)
+        s.drops['unknown_state'] = s.rows_in - len(pincodes)
+        df_pin = pincodes.groupby(['district_id', 'pincode'])[value_cols].sum().reset_index()
+        df_pin = aliases.drop_duplicates('district_id')[['district_id', 'state', 'district', 'state_id']].merge(df_pin, on='district_id')
+        s.rows_out = len(df_pin)
+    return compact_counts(df_pin[['state', 'district', 'state_id', 'district_id', 'pincode'] + value_cols], value_cols)
 
 # ==========================================
 # 3. EXECUTION BLOCK
 # ==========================================
 
-# Define your input files and their metric columns
-tasks = {
-    'biometric': ('phase2_ready_biometric.csv', ['bio_age_5_17', 'bio_age_17_']),
-    'demographic': ('phase2_ready_demographic.csv', ['demo_age_5_17', 'demo_age_17_']),
-    'enrolment': ('phase2_ready_enrolment.csv', ['age_0_5', 'age_5_17', 'age_18_greater'])
+# Input files and their metric columns
+TASKS = {
+    'biometric': ('phase2_ready_biometric', 'cleaned_pincodes_biometric', ['bio_age_5_17', 'bio_age_17_']),
+    'demographic': ('phase2_ready_demographic', 'cleaned_pincodes_demographic', ['demo_age_5_17', 'demo_age_17_']),
+    'enrolment': ('phase2_ready_enrolment', 'cleaned_pincodes_enrolment', ['age_0_5', 'age_5_17', 'age_18_greater'])
 }
 
-for name, (file, cols) in tasks.items():
-    cleaned_df = process_dataset(file, cols)
-    if cleaned_df is not None:
-        output_name = f"final_cleaned_{name}.csv"
-        cleaned_df.to_csv(output_name, index=False)
-        print(f"💾 Saved to: {output_name}\n")
+def finalize_dataset(name, registry, states, source=None):
+    """
+    Phase 2 cleaning for one dataset: writes final_cleaned_<name>, the same
+    grid as memory-mapped matrices (final_matrix_<name>), its
+    district_aliases_<name> and final_pincodes_<name>. `source` overrides
+    the phase2_ready input (e.g. the cleaned master itself).
+    Returns False when the input is missing.
+    """
+    file, pincode_file, cols = TASKS[name]
+    cleaned_df, aliases = process_dataset(source or file, cols, registry, states, chunksize=FINAL_CHUNK_SIZE)
+    if cleaned_df is None:
+        return False
+    output_name = f"final_cleaned_{name}"
+    write_store(cleaned_df, output_name)
+    if not cleaned_df.empty:
+        # District x day grid for window / std / spike consumers (matrix_store.py)
+        with step('write_matrix', rows_in=len(cleaned_df), dataset=name):
+            write_matrix_store(cleaned_df, f"final_matrix_{name}", cols)
+    # Alias table + pincode totals on the same clusters (used by SEC)
+    write_store(aliases, f"district_aliases_{name}")
+    pincode_df = apply_aliases(pincode_file, cols, aliases)
+    if pincode_df is not None:
+        write_store(pincode_df, f"final_pincodes_{name}")
+    print(f"💾 Saved to: {output_name}\n")
+    return True
+
+if __name__ == "__main__":
+    # Per-step timings, memory and drop counts (see telemetry.py)
+    start_run('final_clean')
+    try:
+        registry = LocationRegistry()
+        states = StateCanonicalizer()
+
+        for name in TASKS:
+            finalize_dataset(name, registry, states)
 
-print("🚀 ALL SYSTEMS GO. Your data is now statistically pure.")
\ No newline at end of file
+        registry.save()
+        states.save()
+        print("🚀 ALL SYSTEMS GO. Your data is now statistically pure.")
+    finally:
+        # Failed runs keep their steps (status names the exception)
+        save_report()
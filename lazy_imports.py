@@ -0,0 +1,26 @@
+import importlib
+import sys
+import types
+
+# ==========================================
+# LAZY MODULE IMPORTS
+# ==========================================
+# pandas, numpy, pyarrow and scipy take most of a cold start. Library
+# modules bind them with lazy_import(), so importing e.g. sec_scores costs
+# milliseconds and the real import happens on the first call that uses them:
+#
+#   pd = lazy_import('pandas')
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for module `name` and imports it on first attribute access."""
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        # Later lookups hit the copied attributes directly
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """The module if it is already loaded, else a LazyModule for it (submodules work too)."""
+    return sys.modules.get(name) or LazyModule(name)
@@ -0,0 +1,105 @@
+import json
+import os
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# ==========================================
+# LOCATION REGISTRY (Compact Keys)
+# ==========================================
+# Every canonical state and (state, district) pair gets a stable integer ID.
+# IDs are append-only: a location keeps its ID across runs and new locations
+# take the next free one, so stores written on different days join cleanly.
+
+REGISTRY_PATH = 'location_registry.json'
+
+STATE_ID_DTYPE = 'int16'
+DISTRICT_ID_DTYPE = 'int32'
+PINCODE_DTYPE = 'int32'
+
+
+class LocationRegistry:
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.state_names = []        # state_id -> name
+        self.district_names = []     # district_id -> name
+        self.district_states = []    # district_id -> state_id
+        if path and os.path.exists(path):
+            with open(path) as fh:
+                data = json.load(fh)
+            self.state_names = data['states']
+            for state_id, name in data['districts']:
+                self.district_states.append(state_id)
+                self.district_names.append(name)
+        self._state_ids = {name: i for i, name in enumerate(self.state_names)}
+        self._district_ids = {
+            (s, name): i for i, (s, name) in enumerate(zip(self.district_states, self.district_names))
+        }
+
+    def state_id(self, name):
+        if name not in self._state_ids:
+            self._state_ids[name] = len(self.state_names)
+            self.state_names.append(name)
+        return self._state_ids[name]
+
+    def district_id(self, state_id, name):
+        key = (int(state_id), name)
+        if key not in self._district_ids:
+            self._district_ids[key] = len(self.district_names)
+            self.district_states.append(key[0])
+            self.district_names.append(name)
+        return self._district_ids[key]
+
+    def encode(self, df, state_col='state', district_col='district'):
+        """
+        Adds 'state_id' and 'district_id' columns. Names are hashed once per
+        distinct value, never per row.
+        """
+        s_codes, s_uniques = pd.factorize(df[state_col])
+        s_ids = np.array([self.state_id(n) for n in s_uniques], dtype=STATE_ID_DTYPE)
+        state_ids = s_ids[s_codes]
+
+        d_codes, d_uniques = pd.factorize(df[district_col])
+        n = max(len(d_uniques), 1)
+        p_codes, p_uniques = pd.factorize(state_ids.astype(np.int64) * n + d_codes)
+        d_ids = np.array(
+            [self.district_id(p // n, d_uniques[p % n]) for p in p_uniques],
+            dtype=DISTRICT_ID_DTYPE
+        )
+        return df.assign(state_id=state_ids, district_id=d_ids[p_codes])
+
+    def decode(self, df, id_col='district_id'):
+        """Adds 'state_id', 'state' and 'district' columns from district IDs."""
+        ids = df[id_col].to_numpy()
+        state_ids = np.asarray(self.district_states, dtype=STATE_ID_DTYPE)[ids]
+        return df.assign(
+            state_id=state_ids,
+            state=np.asarray(self.state_names, dtype=object)[state_ids],
+            district=np.asarray(self.district_names, dtype=object)[ids],
+        )
+
+    def save(self):
+        data = {
+            'states': self.state_names,
+            'districts': [[s, name] for s, name in zip(self.district_states, self.district_names)],
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def compact_counts(df, value_cols):
+    """
+    Narrows whole-number, non-negative count columns to the smallest
+    unsigned integer type that holds them. Other columns are left alone.
+    """
+    df = df.copy()
+    for col in value_cols:
+        values = df[col]
+        if values.isna().any() or (values < 0).any() or (values % 1 != 0).any():
+            continue
+        df[col] = pd.to_numeric(values.astype('uint64'), downcast='unsigned')
+    return df
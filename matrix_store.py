@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# ==========================================
+# DISTRICT x DAY MATRIX STORE (Memory-Mapped)
+# ==========================================
+# The gap-free district x day grid as one .npy matrix per metric column
+# (a row per district, a column per consecutive day), plus the row keys and
+# labels. Matrices are opened with mmap, so opening costs the same for one
+# month or ten years of history, and per-district reductions, windows and
+# slices only read the pages they touch:
+#
+#   grid = MatrixStore('final_matrix_biometric')
+#   bio = grid['bio_age_5_17']                        # (districts, days)
+#   std = bio.std(axis=1, ddof=1, dtype='float64')    # ALV per district
+#   spark = grid.series('bio_age_5_17', district_id, start='2025-01-01')
+
+META_FILE = 'meta.json'
+
+
+def write_matrix_store(df, path, value_cols, key='district_id', labels=('state', 'district')):
+    """
+    Writes the (date, key) rows of `df` (one per pair) as dense key x day
+    matrices, one per value column, replacing any old store. Days without
+    a row are 0.
+    Rows are sorted by key; `labels` columns are kept per row for display.
+    """
+    dates = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+    first, last = dates.min(), dates.max()
+    keys, rows = np.unique(df[key].to_numpy(), return_inverse=True)
+    days = (dates - first).astype('int64')
+    shape = (len(keys), int((last - first).astype('int64')) + 1)
+
+    tmp = f"{path}.tmp"
+    if os.path.isdir(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+    for col in value_cols:
+        # Written straight into the file, never held as a second dense copy
+        matrix = np.lib.format.open_memmap(os.path.join(tmp, f"{col}.npy"), mode='w+',
+                                           dtype=df[col].dtype, shape=shape)
+        matrix[:] = 0
+        matrix[rows, days] = df[col].to_numpy()
+        matrix.flush()
+        del matrix
+    np.save(os.path.join(tmp, 'keys.npy'), keys)
+
+    by_key = df.drop_duplicates(subset=key).set_index(key)
+    meta = {
+        'key': key,
+        'columns': list(value_cols),
+        'start': str(first),
+        'n_days': shape[1],
+        'labels': {c: by_key[c].astype(str).reindex(keys).tolist() for c in labels if c in df.columns},
+    }
+    with open(os.path.join(tmp, META_FILE), 'w') as fh:
+        json.dump(meta, fh)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+
+
+class MatrixStore:
+    """Read side: memory-mapped matrices plus row keys, labels and the day axis."""
+    def __init__(self, path):
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No matrix store at '{path}'")
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        self.path = path
+        self.key = meta['key']
+        self.columns = meta['columns']
+        self.start = np.datetime64(meta['start'], 'D')
+        self.n_days = meta['n_days']
+        self.labels = meta['labels']
+        self.keys = np.load(os.path.join(path, 'keys.npy'), mmap_mode='r')
+        self._matrices = {}
+
+    @property
+    def dates(self):
+        return pd.date_range(str(self.start), periods=self.n_days, freq='D')
+
+    @property
+    def end(self):
+        return self.start + np.timedelta64(self.n_days - 1, 'D')
+
+    def __getitem__(self, col):
+        """The whole (districts, days) matrix of `col`, memory-mapped read-only."""
+        if col not in self._matrices:
+            self._matrices[col] = np.load(os.path.join(self.path, f"{col}.npy"), mmap_mode='r')
+        return self._matrices[col]
+
+    def day(self, date):
+        """Column index of `date` (may fall outside the grid)."""
+        return int((np.datetime64(pd.Timestamp(date).date(), 'D') - self.start).astype('int64'))
+
+    def rows(self, keys):
+        """Row positions of `keys`; -1 where a key has no row."""
+        keys = np.asarray(keys)
+        if not len(self.keys):
+            return np.full(len(keys), -1)
+        pos = np.searchsorted(self.keys, keys).clip(max=len(self.keys) - 1)
+        return np.where(self.keys[pos] == keys, pos, -1)
+
+    def window(self, col, start=None, end=None):
+        """
+        Columns `start`..`end` (inclusive) of `col`. A zero-copy view when
+        the range lies inside the grid; days outside it are padded with 0.
+        """
+        lo = 0 if start is None else self.day(start)
+        hi = self.n_days - 1 if end is None else self.day(end)
+        matrix = self[col]
+        if lo >= 0 and hi < self.n_days:
+            return matrix[:, lo:hi + 1]
+        out = np.zeros((matrix.shape[0], max(hi - lo + 1, 0)), dtype=matrix.dtype)
+        src_lo, src_hi = max(lo, 0), min(hi, self.n_days - 1)
+        if src_lo <= src_hi:
+            out[:, src_lo - lo:src_hi - lo + 1] = matrix[:, src_lo:src_hi + 1]
+        return out
+
+    def series(self, col, key, start=None, end=None):
+        """One district's daily values (e.g. a sparkline); None if it has no row."""
+        row = self.rows([key])[0]
+        return None if row < 0 else self.window(col, start, end)[row]
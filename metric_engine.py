@@ -0,0 +1,328 @@
+import hashlib
+import json
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+from lazy_imports import lazy_import
+from columnar_store import iter_frames
+from telemetry import step
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# ==========================================
+# SINGLE-SCAN METRIC ENGINE
+# ==========================================
+# Pillars are derived from per-district accumulators. The engine reads each
+# stage store once, in chunks, and hands every chunk to all accumulators
+# that need that store. A new pillar adds an accumulator, not a new scan.
+#
+# Accumulator state is mergeable, so it is persisted between runs and a
+# daily refresh only folds in the days after the last one it has seen.
+# The saved state also holds a digest of each store's rows up to that day;
+# if those rows changed since (late shards, revised days, re-clustered
+# aliases or re-keyed district IDs), the store is re-read in full.
+
+# Fold per-chunk partials together after this many chunks
+FOLD_EVERY = 16
+
+STATE_DIR = 'metric_state'
+
+
+class Accumulator(ABC):
+    """
+    Running per-key statistic over the chunks of one stage store.
+    Subclasses reduce a chunk to an indexed partial in `summarize`;
+    partials are additive and folded by summing.
+    `dated` accumulators read stores with a 'date' column and can be
+    extended day by day; the others are re-read in full on update.
+    """
+    dated = True
+
+    def __init__(self, source, column, key='district_id'):
+        self.source = source
+        self.column = column
+        self.key = key
+        self.partials = []
+
+    @property
+    def columns(self):
+        return [self.key, self.column]
+
+    @abstractmethod
+    def summarize(self, chunk):
+        """Reduces one chunk to an indexed partial."""
+
+    def update(self, chunk):
+        self.partials.append(self.summarize(chunk))
+        if len(self.partials) >= FOLD_EVERY:
+            self.partials = [self._fold(self.partials)]
+
+    def reset(self):
+        self.partials = []
+
+    @staticmethod
+    def _fold(partials):
+        partials = pd.concat(partials)
+        return partials.groupby(level=list(range(partials.index.nlevels))).sum()
+
+    def result(self):
+        return self._fold(self.partials) if self.partials else None
+
+    # --- Persistence ---
+    def save(self, path):
+        """Writes the folded state; returns metadata for load()."""
+        result = self.result()
+        if result is not None:
+            pd.DataFrame(result).to_parquet(path)
+        return {'series': isinstance(result, pd.Series)}
+
+    def load(self, path, meta):
+        if os.path.exists(path):
+            frame = pd.read_parquet(path)
+            self.partials = [frame.iloc[:, 0] if meta.get('series') else frame]
+
+
+class SumAccumulator(Accumulator):
+    """Total of a column per key."""
+    def summarize(self, chunk):
+        return chunk[self.column].astype('float64').groupby(chunk[self.key].to_numpy()).sum().rename_axis(self.key)
+
+
+class MomentAccumulator(Accumulator):
+    """
+    Row count, sum and M2 (sum of squared deviations) of a daily series per
+    key, plus the overall date span. Partials merge exactly with the
+    pairwise update of Chan, Golub & LeVeque, so any split of the rows
+    (chunks, days, runs) gives the same moments.
+    """
+    def __init__(self, source, column, key='district_id'):
+        super().__init__(source, column, key)
+        self.first_date = None
+        self.last_date = None
+
+    @property
+    def columns(self):
+        return [self.key, 'date', self.column]
+
+    def update(self, chunk):
+        if len(chunk):
+            dates = pd.to_datetime(chunk['date'])
+            first, last = dates.min(), dates.max()
+            self.first_date = first if self.first_date is None else min(self.first_date, first)
+            self.last_date = last if self.last_date is None else max(self.last_date, last)
+        super().update(chunk)
+
+    def reset(self):
+        super().reset()
+        self.first_date = self.last_date = None
+
+    def summarize(self, chunk):
+        # Narrow unsigned counts would wrap when squared
+        values = pd.Series(chunk[self.column].to_numpy(dtype='float64'))
+        keys = chunk[self.key].to_numpy()
+        deviation = values - values.groupby(keys).transform('mean')
+        moments = pd.DataFrame({'count': 1, 'sum': values, 'm2': deviation ** 2})
+        return moments.groupby(keys).sum().rename_axis(self.key)
+
+    @staticmethod
+    def _fold(partials):
+        # k-way Chan merge: M2 = sum(M2_i) + sum(n_i * (mean_i - mean)^2)
+        parts = pd.concat(partials)
+        keys = parts.index
+        totals = parts.groupby(level=0)[['count', 'sum']].sum()
+        mean = (totals['sum'] / totals['count']).reindex(keys).to_numpy()
+        spread = parts['count'] * (parts['sum'] / parts['count'] - mean) ** 2
+        totals['m2'] = (parts['m2'] + spread).groupby(level=0).sum()
+        return totals
+
+    @property
+    def n_days(self):
+        if self.first_date is None:
+            return 0
+        return (self.last_date - self.first_date).days + 1
+
+    def save(self, path):
+        meta = super().save(path)
+        for field in ('first_date', 'last_date'):
+            value = getattr(self, field)
+            meta[field] = None if value is None else str(value.date())
+        return meta
+
+    def load(self, path, meta):
+        super().load(path, meta)
+        self.first_date = pd.Timestamp(meta['first_date']) if meta.get('first_date') else None
+        self.last_date = pd.Timestamp(meta['last_date']) if meta.get('last_date') else None
+
+
+class PincodeVolumeAccumulator(Accumulator):
+    """Volume of a column per (key, pincode), from whole-feed pincode totals."""
+    dated = False
+
+    @property
+    def columns(self):
+        return [self.key, 'pincode', self.column]
+
+    def summarize(self, chunk):
+        return chunk.groupby([self.key, 'pincode'])[self.column].sum().astype('float64')
+
+
+def std_with_zeros(moments, n_days):
+    """
+    Per-key sample std over `n_days` days from count/sum/M2 moments.
+    Days without a row count as 0: they are merged in as one more
+    partition with mean 0 and M2 0, so dense and sparse masters agree.
+    """
+    if n_days < 2:
+        return pd.Series(np.nan, index=moments.index)
+    count = moments['count']
+    mean = moments['sum'] / n_days
+    m2 = moments['m2'] + count * (moments['sum'] / count - mean) ** 2 + (n_days - count) * mean ** 2
+    return (m2.clip(lower=0) / (n_days - 1)) ** 0.5
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def history_digest(source, through):
+    """
+    Content hash of a dated store's rows up to `through` (inclusive), or
+    None for a legacy CSV stage. Files of earlier months are hashed as
+    bytes; the month of `through` also holds later days, so only its rows
+    up to `through` are read and hashed.
+    """
+    if not os.path.isdir(source):
+        return None
+    through = pd.Timestamp(through)
+    last_month = through.strftime('%Y-%m')
+    entries = []
+    for root, _, files in os.walk(source):
+        # Keyed by partition folder: file names are random
+        rel = os.path.relpath(root, source)
+        month = next((p[len('month='):] for p in rel.split(os.sep) if p.startswith('month=')), None)
+        if month is None or month > last_month:
+            continue
+        for f in files:
+            path = os.path.join(root, f)
+            if month < last_month:
+                entries.append((rel, _file_digest(path)))
+                continue
+            rows = pd.read_parquet(path)
+            rows = rows[pd.to_datetime(rows['date']) <= through]
+            hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+            entries.append((rel, hashlib.sha256(hashes.tobytes()).hexdigest()))
+    return hashlib.sha256(json.dumps(sorted(entries)).encode()).hexdigest()
+
+
+class MetricEngine:
+    """Feeds every chunk of each stage store to the accumulators that read it."""
+    def __init__(self, accumulators):
+        self.accumulators = accumulators
+        # Last date folded in, per dated source store, and a digest of
+        # the store's rows up to it (see history_digest)
+        self.through = {}
+        self.history = {}
+
+    def scan(self, chunksize=None, start=None, end=None):
+        """
+        One pass per source store. Dated stores are read from `start` to
+        `end` (inclusive) when given; `start` may be a {source: date} dict.
+        Returns {name: accumulator} for sources that exist; accumulators
+        over missing stores are left out.
+        """
+        by_source = {}
+        for name, acc in self.accumulators.items():
+            by_source.setdefault(acc.source, []).append(name)
+
+        found = {}
+        for source, names in by_source.items():
+            accs = [self.accumulators[n] for n in names]
+            dated = all(acc.dated for acc in accs)
+            columns = list(dict.fromkeys(c for acc in accs for c in acc.columns))
+            if dated and 'date' not in columns:
+                columns.append('date')
+            window = (start.get(source) if isinstance(start, dict) else start, end) if dated else (None, None)
+            try:
+                frames = iter_frames(source, columns=columns, batch_size=chunksize, start=window[0], end=window[1])
+            except FileNotFoundError:
+                print(f"⚠️  WARNING: '{source}' not found.")
+                continue
+            with step('scan_store', source=source, accumulators=names) as s:
+                s.rows_in = 0
+                for chunk in frames:
+                    s.rows_in += len(chunk)
+                    if dated and len(chunk):
+                        last = pd.Timestamp(chunk['date'].max())
+                        self.through[source] = max(self.through.get(source, last), last)
+                    for acc in accs:
+                        acc.update(chunk)
+            found.update({n: self.accumulators[n] for n in names})
+        return found
+
+    def update(self, chunksize=None, end=None):
+        """
+        Folds in only the days after each dated store's last folded date
+        (up to `end`). A store whose folded days changed since the state
+        was saved, or that `end` would cut back, is re-read in full.
+        Undated accumulators (whole-feed totals) are refreshed from their
+        stores, which are small.
+        """
+        for acc in self.accumulators.values():
+            if not acc.dated:
+                acc.reset()
+        start = {}
+        for source, last in list(self.through.items()):
+            known = self.history.get(source)
+            cut = end is not None and pd.Timestamp(end) < last
+            if not cut and known is not None and known == history_digest(source, last):
+                start[source] = last + pd.Timedelta(days=1)
+                continue
+            reason = f"ends after {pd.Timestamp(end).date()}" if cut else f"changed up to {last.date()}"
+            print(f"🔁 Saved state of '{source}' {reason}: re-reading it in full.")
+            for acc in self.accumulators.values():
+                if acc.source == source:
+                    acc.reset()
+            del self.through[source]
+        return self.scan(chunksize=chunksize, start=start, end=end)
+
+    def save(self, path=STATE_DIR):
+        """Writes every accumulator's folded state, replacing any old one."""
+        tmp = f"{path}.tmp"
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+        self.history = {s: history_digest(s, d) for s, d in self.through.items()}
+        meta = {'through': {s: str(d.date()) for s, d in self.through.items()},
+                'history': self.history, 'accumulators': {}}
+        for name, acc in self.accumulators.items():
+            meta['accumulators'][name] = acc.save(os.path.join(tmp, f"{name}.parquet"))
+        with open(os.path.join(tmp, 'state.json'), 'w') as fh:
+            json.dump(meta, fh, indent=1)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+
+    def load(self, path=STATE_DIR):
+        """
+        Restores saved state. Returns False (engine untouched) when there is
+        none or it lacks one of this engine's accumulators.
+        """
+        meta_path = os.path.join(path, 'state.json')
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        if set(meta['accumulators']) != set(self.accumulators):
+            return False
+        for name, acc in self.accumulators.items():
+            acc.load(os.path.join(path, f"{name}.parquet"), meta['accumulators'][name])
+        self.through = {s: pd.Timestamp(d) for s, d in meta['through'].items()}
+        # State saved without digests is re-read in full on update
+        self.history = meta.get('history', {})
+        return True
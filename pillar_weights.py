@@ -0,0 +1,12 @@
+# ==========================================
+# PILLAR WEIGHTS
+# ==========================================
+# Shared by the metrics stage (calculate_metrics.py) and the What-If
+# simulator (simulator.py), so the dashboard app can score scenarios
+# without importing the metrics pipeline.
+
+# SAMARTH = 0.4 x NEEV + 0.3 x GATI + 0.3 x NYAY
+PILLAR_WEIGHTS = (0.4, 0.3, 0.3)
+
+# Share of ALV taken by the batch-dump burst score (0 = volatility only)
+ALV_BURST_WEIGHT = 0.5
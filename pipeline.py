@@ -0,0 +1,299 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# ==========================================
+# PIPELINE RUNNER (Stage Graph + Cache)
+# ==========================================
+# Runs the whole pipeline as a dependency graph:
+#
+#   preprocess:<dataset>  ->  final_clean:<dataset>  ->  metrics
+#
+# The three preprocess lanes are independent and run in parallel processes.
+# The final_clean lanes share the append-only location registry and state
+# alias table, so they run one at a time in dataset order (which also keeps
+# district IDs stable); their clustering fans out over cores on its own.
+#
+# A stage is skipped when its key (hash of its code files, parameters and
+# input contents) matches the last successful run and its outputs are
+# intact. Keys use input *contents*, so a stage that re-runs but writes
+# the same data does not invalidate the stages after it.
+#
+#   python pipeline.py                    # run whatever is stale
+#   python pipeline.py metrics            # metrics and what it needs
+#   python pipeline.py --force preprocess --jobs 3
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATASETS = ('biometric', 'demographic', 'enrolment')
+STATE_PATH = 'pipeline_state.json'
+
+# Parallel dataset lanes (processes)
+PIPELINE_JOBS = min(len(DATASETS), os.cpu_count() or 1)
+
+
+class Stage:
+    """
+    One unit of work. `deps` only order the graph; what invalidates a stage
+    is a change in its `code` files, `params` or `inputs` (paths or globs).
+    """
+    def __init__(self, name, func, args=(), deps=(), code=(), inputs=(), outputs=(), params=None):
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.deps = list(deps)
+        self.code = list(code)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+
+    def key(self, state):
+        parts = {
+            'code': {f: state.digest(os.path.join(REPO_DIR, f)) for f in self.code},
+            'inputs': {p: state.digest(p) for p in self.inputs},
+            'params': self.params,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def outputs_digest(self, state):
+        return {p: state.digest(p) for p in self.outputs}
+
+
+class PipelineState:
+    """Stage keys of the last successful runs, plus a file fingerprint cache."""
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.stages = {}
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as fh:
+                data = json.load(fh)
+            self.stages = data.get('stages', {})
+            self.files = data.get('files', {})
+
+    def _file_hash(self, path):
+        from preprocessing import ShardManifest
+        # Unchanged size and mtime: the recorded hash is reused
+        self.files[path] = ShardManifest.fingerprint(path, self.files.get(path))
+        return self.files[path]['sha256']
+
+    def digest(self, path):
+        """
+        Content hash of a file, a store directory or a glob of files; None
+        when nothing exists. Store files are keyed by partition folder, not
+        by their (random) file names.
+        """
+        if os.path.isdir(path):
+            entries = []
+            for root, _, files in os.walk(path):
+                rel = os.path.relpath(root, path)
+                entries += [(rel, self._file_hash(os.path.join(root, f))) for f in files]
+            items = sorted(entries)
+        else:
+            matches = sorted(glob.glob(path))
+            if not matches:
+                return None
+            items = [(os.path.basename(f), self._file_hash(f)) for f in matches]
+        return hashlib.sha256(json.dumps(items).encode()).hexdigest()
+
+    def is_fresh(self, stage, key):
+        last = self.stages.get(stage.name)
+        return bool(last) and last['key'] == key and last['outputs'] == stage.outputs_digest(self)
+
+    def record(self, stage, key):
+        self.stages[stage.name] = {'key': key, 'outputs': stage.outputs_digest(self)}
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump({'stages': self.stages, 'files': self.files}, fh, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+# ==========================================
+# STAGE FUNCTIONS (run in worker processes)
+# ==========================================
+
+def run_preprocess(name):
+    from preprocessing import refine_dataset
+    from telemetry import save_report, start_run
+    start_run(f'preprocess:{name}')
+    try:
+        refine_dataset(name)
+    finally:
+        save_report()
+
+def run_final_clean(name):
+    from cleaning_engines import StateCanonicalizer
+    from final_clean import finalize_dataset
+    from location_registry import LocationRegistry
+    from telemetry import save_report, start_run
+    start_run(f'final_clean:{name}')
+    try:
+        registry = LocationRegistry()
+        states = StateCanonicalizer()
+        # The cleaned master is the phase 2 input; no phase2_ready copy needed
+        if not finalize_dataset(name, registry, states, source=f'cleaned_master_{name}'):
+            raise FileNotFoundError(f"cleaned_master_{name} not found")
+        registry.save()
+        states.save()
+    finally:
+        save_report()
+
+def run_metrics(update, through):
+    from calculate_metrics import build_dashboard
+    from telemetry import save_report, start_run
+    start_run('metrics')
+    try:
+        if build_dashboard(update=update, through=through) is None:
+            raise RuntimeError("dashboard not built")
+    finally:
+        save_report()
+
+# ==========================================
+# GRAPH & SCHEDULER
+# ==========================================
+
+def build_graph(update=False, through=None):
+    from calculate_metrics import DASHBOARD_PATH, TRENDS_PATH
+    from location_registry import REGISTRY_PATH
+    from metric_engine import STATE_DIR
+    from rollup_cube import CUBE_PATH
+    from preprocessing import TASKS
+
+    stages = []
+    for name in DATASETS:
+        stages.append(Stage(
+            f'preprocess:{name}', run_preprocess, (name,),
+            code=['preprocessing.py', 'columnar_store.py', 'location_registry.py', 'telemetry.py',
+                  'lazy_imports.py'],
+            inputs=[TASKS[name][1]],
+            outputs=[f'cleaned_master_{name}', f'cleaned_pincodes_{name}'],
+        ))
+
+    previous = []
+    for name in DATASETS:
+        stages.append(Stage(
+            f'final_clean:{name}', run_final_clean, (name,),
+            deps=[f'preprocess:{name}'] + previous,
+            code=['final_clean.py', 'cleaning_engines.py', 'columnar_store.py', 'location_registry.py',
+                  'matrix_store.py', 'telemetry.py', 'lazy_imports.py'],
+            inputs=[f'cleaned_master_{name}', f'cleaned_pincodes_{name}'],
+            outputs=[f'final_cleaned_{name}', f'final_matrix_{name}', f'district_aliases_{name}',
+                     f'final_pincodes_{name}'],
+        ))
+        # Registry writers run in order (see header)
+        previous = [f'final_clean:{name}']
+
+    stages.append(Stage(
+        'metrics', run_metrics, (update, through),
+        deps=previous,
+        code=['calculate_metrics.py', 'metric_engine.py', 'columnar_store.py', 'location_registry.py',
+              'matrix_store.py', 'spike_detector.py', 'bootstrap_ci.py', 'rollup_cube.py',
+              'pillar_weights.py', 'telemetry.py', 'lazy_imports.py'],
+        inputs=['final_cleaned_biometric', 'final_cleaned_enrolment', 'final_pincodes_biometric',
+                'final_pincodes_enrolment', 'final_matrix_biometric', 'final_matrix_enrolment', REGISTRY_PATH],
+        outputs=[DASHBOARD_PATH, TRENDS_PATH, CUBE_PATH, STATE_DIR],
+        params={'update': update, 'through': through},
+    ))
+    return stages
+
+def _matches(stage, names):
+    return any(stage.name == n or stage.name.startswith(f"{n}:") for n in names)
+
+def select(stages, targets):
+    """The target stages (names or prefixes like 'preprocess') and everything they need."""
+    by_name = {s.name: s for s in stages}
+    wanted = set()
+    todo = [s.name for s in stages if _matches(s, targets)]
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo += by_name[name].deps
+    return [s for s in stages if s.name in wanted]
+
+def run(stages, jobs=PIPELINE_JOBS, force=(), state_path=STATE_PATH):
+    """
+    Runs stale stages as soon as their dependencies finish, up to `jobs` at
+    a time. Returns the names of stages that failed or were blocked.
+    """
+    state = PipelineState(state_path)
+    names = {s.name for s in stages}
+    pending = list(stages)
+    done, failed = set(), []
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for stage in list(pending):
+                    deps = [d for d in stage.deps if d in names]
+                    if any(d in failed for d in deps):
+                        print(f"⛔ {stage.name}: blocked by a failed stage")
+                        pending.remove(stage)
+                        failed.append(stage.name)
+                        progressed = True
+                    elif all(d in done for d in deps):
+                        pending.remove(stage)
+                        key = stage.key(state)
+                        if not _matches(stage, force) and state.is_fresh(stage, key):
+                            print(f"⏭️  {stage.name}: up to date")
+                            done.add(stage.name)
+                            progressed = True
+                        else:
+                            print(f"▶️  {stage.name}")
+                            running[pool.submit(stage.func, *stage.args)] = (stage, key)
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, key = running.pop(future)
+                try:
+                    future.result()
+                except Exception as exc:
+                    print(f"❌ {stage.name} failed: {exc!r}")
+                    failed.append(stage.name)
+                    continue
+                state.record(stage, key)
+                state.save()
+                done.add(stage.name)
+                print(f"✅ {stage.name}")
+    state.save()
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the SAMARTH pipeline, skipping up-to-date stages.")
+    parser.add_argument('targets', nargs='*', help="stages to bring up to date (default: all), "
+                                                    "e.g. metrics or final_clean:enrolment")
+    parser.add_argument('--force', nargs='*', metavar='STAGE',
+                        help="re-run these stages even if up to date (no names = all)")
+    parser.add_argument('--jobs', type=int, default=PIPELINE_JOBS, help="parallel dataset lanes")
+    parser.add_argument('--update', action='store_true', help="metrics: fold only new days into saved state")
+    parser.add_argument('--through', help="metrics: last date to fold in (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    stages = build_graph(update=args.update, through=args.through)
+    if args.targets:
+        unknown = [t for t in args.targets if not any(_matches(s, [t]) for s in stages)]
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(unknown)}")
+        stages = select(stages, args.targets)
+    force = [s.name for s in stages] if args.force == [] else (args.force or [])
+
+    failed = run(stages, jobs=max(1, args.jobs), force=force)
+    if failed:
+        print(f"\n❌ {len(failed)} stage(s) did not complete: {', '.join(failed)}")
+        return 1
+    print("\n🚀 Pipeline up to date.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
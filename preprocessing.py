@@ -1,7 +1,22 @@
-import pandas as pd
-import numpy as np
 import glob
+import hashlib
+import json
+import os
 import re
+import shutil
+import tempfile
+from collections import Counter
+
+from lazy_imports import lazy_import
+from columnar_store import replace_months, store_dtypes, write_store
+from location_registry import PINCODE_DTYPE, compact_counts
+from telemetry import save_report, start_run, step
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+ds = lazy_import('pyarrow.dataset')
+pq = lazy_import('pyarrow.parquet')
+pa = lazy_import('pyarrow')
 
 # ==========================================
 # CONFIGURATION
@@ -19,6 +34,130 @@ STATE_MAPPING = {
     # Add any other variations found in raw data
 }
 
+# Streaming Mode: rows read per shard chunk. Set to None to load shards whole.
+STREAM_CHUNK_SIZE = 500_000
+
+# Streaming deduplication: cleaned chunks are spilled to disk sorted by
+# month, then by a hash bucket of (date, state, district). Copies of a row
+# share those keys, so they share a month and a bucket, and the spills are
+# deduplicated exactly one month and bucket range at a time. Peak memory
+# follows STREAM_CHUNK_SIZE and DEDUP_MERGE_ROWS, not the size of the feed.
+SPILL_DIR = 'dedup_spill'
+DEDUP_MERGE_ROWS = 2_000_000
+SPILL_ROW_GROUP = 65_536
+HASH_BUCKETS = 1 << 16
+
+# Fold the per-chunk district partials together after this many chunks
+PARTIAL_FOLD_EVERY = 16
+
+DISTRICT_KEYS = ['date', 'state', 'district']
+
+# Pincode totals over the whole feed, kept for the SEC pillar
+PINCODE_KEYS = ['state', 'district', 'pincode']
+
+# Implicit Zeros: skip the dense Date x District skeleton and write only
+# days with activity. Downstream stages treat the missing days as 0.
+IMPLICIT_ZEROS = False
+
+# Incremental Mode: only shards that are new or changed since the last run
+# are cleaned, only the months they touch are merged again, and only the
+# master partitions from the earliest such month on are rewritten.
+INCREMENTAL = True
+SHARD_CACHE_DIR = 'shard_cache'
+# Per-month merged partials, under each dataset's shard cache
+MERGED_DIR = 'merged'
+
+class ShardManifest:
+    """
+    Records the content hash, size, raw row count and Step 1-4 drop counts
+    of every shard already ingested; its spilled rows are cached under
+    its content hash.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as fh:
+                self.entries = json.load(fh)
+
+    @staticmethod
+    def fingerprint(path, known=None):
+        stat = os.stat(path)
+        # Same size and mtime as last time: trust the recorded hash
+        if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            return known
+        digest = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(block)
+        return {'sha256': digest.hexdigest(), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def diff(self, files):
+        """Splits shards into new, changed and removed, with fresh fingerprints."""
+        new, changed, prints = [], [], {}
+        for f in files:
+            known = self.entries.get(f)
+            prints[f] = self.fingerprint(f, known)
+            if known is None:
+                new.append(f)
+            elif known['sha256'] != prints[f]['sha256'] or known['size'] != prints[f]['size']:
+                changed.append(f)
+        removed = [f for f in self.entries if f not in prints]
+        return new, changed, removed, prints
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump(self.entries, fh, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+def _map_unique(series, transform, fill=None):
+    """
+    Applies `transform` to the distinct values of `series` only and maps the
+    results back to every row. Missing values map to `fill`.
+    """
+    codes, uniques = pd.factorize(series)
+    mapped = np.asarray(transform(pd.Series(uniques, dtype=series.dtype)))
+    # Code -1 (missing) picks the appended fill value
+    return np.append(mapped, np.array([fill], dtype=mapped.dtype))[codes]
+
+def _month_codes(dates):
+    """YYYYMM integer of each date."""
+    return (dates.dt.year * 100 + dates.dt.month).astype('int32')
+
+def _month_label(code):
+    return f"{int(code) // 100:04d}-{int(code) % 100:02d}"
+
+def _spill_rows(frame, value_cols, path):
+    """
+    Writes cleaned rows to one Parquet file, sorted by month and key bucket
+    (see SPILL_DIR). Returns the number of rows per month code.
+    """
+    keys = pd.util.hash_pandas_object(frame[DISTRICT_KEYS], index=False).to_numpy()
+    bucket = (keys % HASH_BUCKETS).astype('uint16')
+    month = _month_codes(frame['date']).to_numpy()
+    order = np.lexsort((bucket, month))
+    # Chunks may disagree on int/float, so metrics are spilled as float64
+    frame = frame.iloc[order].astype({col: 'float64' for col in value_cols})
+    table = pa.Table.from_pandas(frame.assign(month=month[order], bucket=bucket[order]), preserve_index=False)
+    pq.write_table(table, path, row_group_size=SPILL_ROW_GROUP)
+    codes, counts = np.unique(month, return_counts=True)
+    return Counter(dict(zip(codes.tolist(), counts.tolist())))
+
+def _iter_spilled(files, month, rows):
+    """
+    Yields the rows of one month (code) spilled to `files`, one bucket range
+    at a time; `rows` is the month's spilled row count. Every copy of a row
+    lies in the same range; only row groups in range are read.
+    """
+    n_ranges = max(1, -(-rows // DEDUP_MERGE_ROWS))
+    edges = np.linspace(0, HASH_BUCKETS, n_ranges + 1).astype('int64')
+    dataset = ds.dataset(files, format='parquet')
+    in_month = ds.field('month') == month
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        table = dataset.to_table(filter=in_month & (ds.field('bucket') >= lo) & (ds.field('bucket') < hi))
+        yield table.to_pandas().drop(columns=['month', 'bucket'])
+
 class AadhaarDataRefinery:
     def __init__(self, dataset_name):
         self.dataset_name = dataset_name
@@ -30,131 +169,488 @@ class AadhaarDataRefinery:
         if not files:
             return pd.DataFrame()
         
-        df_list = []
-        for f in files:
-            # Read as string first to preserve Pincode leading zeros
-            temp = pd.read_csv(f, dtype={'pincode': str}) 
-            df_list.append(temp)
-            
-        consolidated_df = pd.concat(df_list, ignore_index=True)
+        with step('load_shards', dataset=self.dataset_name, shards=len(files)) as s:
+            df_list = []
+            for f in files:
+                # Read as string first to preserve Pincode leading zeros
+                temp = pd.read_csv(f, dtype={'pincode': str}) 
+                df_list.append(temp)
+                
+            consolidated_df = pd.concat(df_list, ignore_index=True)
+            s.rows_out = len(consolidated_df)
         print(f"[{self.dataset_name}] Raw Consolidated Shape: {consolidated_df.shape}")
         return consolidated_df
 
+    def stream_pipeline(self, file_pattern, value_cols, chunksize=STREAM_CHUNK_SIZE):
+        """
+        Streaming Mode: Steps 6 + 1-5, 7 in bounded memory.
+        Reads every shard in chunks of `chunksize` rows, cleans each chunk and
+        folds it into (date, state, district) and (state, district, pincode)
+        partial aggregates, which are returned as a pair.
+        Duplicates are removed exactly across all shards (see SPILL_DIR).
+        """
+        files = glob.glob(file_pattern)
+        print(f"[{self.dataset_name}] Found {len(files)} shards: {files}")
+        if not files:
+            return pd.DataFrame(), pd.DataFrame()
+
+        with step('stream_pipeline', dataset=self.dataset_name, shards=len(files)) as s:
+            (partial, pincodes), stats, raw_rows, clean_rows = self._clean_files(files, value_cols, chunksize)
+            s.rows_in, s.rows_out = raw_rows, clean_rows
+            s.drops.update(stats)
+        print(f"[{self.dataset_name}] Raw Streamed Rows: {raw_rows}")
+        self._report(stats, raw_rows, clean_rows, len(value_cols) + 4)
+        return partial.reset_index(), pincodes.reset_index()
+
+    def _clean_files(self, files, value_cols, chunksize):
+        """Cleans and deduplicates `files` into indexed district and pincode partials."""
+        with tempfile.TemporaryDirectory(prefix=f'{SPILL_DIR}_', dir='.') as spill_dir:
+            spills, stats, raw_rows, months = self._spill_files(files, value_cols, chunksize, spill_dir)
+            partials, merge_stats, clean_rows = self._merge_spills(spills, value_cols, months)
+        stats.update(merge_stats)
+        return partials, stats, raw_rows, clean_rows
+
+    def _spill_files(self, files, value_cols, chunksize, spill_dir):
+        """
+        Steps 1-4 for `files`, chunk by chunk; the surviving rows are spilled
+        to `spill_dir`. Returns the spill files, drop counts, raw row count
+        and spilled rows per month code.
+        """
+        stats = Counter()
+        spills = []
+        raw_rows = 0
+        months = Counter()
+        for f in files:
+            with step('clean_shard', dataset=self.dataset_name, shard=os.path.basename(f)) as s:
+                s.rows_in = s.rows_out = 0
+                # Read as string first to preserve Pincode leading zeros
+                if chunksize is None:
+                    chunks = [pd.read_csv(f, dtype={'pincode': str})]
+                else:
+                    chunks = pd.read_csv(f, dtype={'pincode': str}, chunksize=chunksize)
+                for chunk in chunks:
+                    rows, chunk_stats = self._clean_chunk(chunk, value_cols, dedup=False)
+                    s.drops.update(chunk_stats)
+                    s.rows_in += len(chunk)
+                    s.rows_out += len(rows)
+                    if len(rows):
+                        spills.append(os.path.join(spill_dir, f"part-{len(spills):05d}.parquet"))
+                        months.update(_spill_rows(rows, value_cols, spills[-1]))
+            stats.update(s.drops)
+            raw_rows += s.rows_in
+        return spills, stats, raw_rows, months
+
+    def _merge_month(self, spills, value_cols, month, rows):
+        """
+        Steps 5 and 7 for one month (code) of spilled rows, one bucket range
+        at a time. Returns its district and pincode partials, drop counts
+        and clean row count.
+        """
+        stats = Counter()
+        partials = []
+        pincode_partials = []
+        clean_rows = 0
+        for spilled in _iter_spilled(spills, month, rows):
+            clean, bucket_stats = self._drop_duplicates_and_negatives(spilled, value_cols)
+            stats.update(bucket_stats)
+            clean_rows += len(clean)
+            # Bucket ranges split districts by day, so district partials never overlap
+            partials.append(clean.groupby(DISTRICT_KEYS)[value_cols].sum())
+            pincode_partials.append(clean.groupby(PINCODE_KEYS)[value_cols].sum())
+        return (self._fold_partials(partials), self._fold_partials(pincode_partials)), stats, clean_rows
+
+    def _merge_spills(self, spills, value_cols, months):
+        """
+        Steps 5 and 7 over spilled rows, month by month (`months`: spilled
+        rows per month code), folded into district and pincode partials.
+        Returns them with drop counts and the clean row count.
+        """
+        stats = Counter()
+        partials = []
+        pincode_partials = []
+        clean_rows = 0
+        with step('merge_spills', dataset=self.dataset_name, spills=len(spills), rows_in=sum(months.values())) as s:
+            for month in sorted(months):
+                (partial, pincodes), month_stats, month_rows = self._merge_month(spills, value_cols, month, months[month])
+                stats.update(month_stats)
+                clean_rows += month_rows
+                partials.append(partial)
+                pincode_partials.append(pincodes)
+                if len(pincode_partials) >= PARTIAL_FOLD_EVERY:
+                    pincode_partials = [self._fold_partials(pincode_partials)]
+            s.rows_out = clean_rows
+            s.drops.update(stats)
+
+        if not partials:
+            empty = (
+                pd.DataFrame(columns=DISTRICT_KEYS + value_cols).set_index(DISTRICT_KEYS),
+                pd.DataFrame(columns=PINCODE_KEYS + value_cols).set_index(PINCODE_KEYS),
+            )
+            return empty, stats, clean_rows
+        folded = (self._fold_partials(partials), self._fold_partials(pincode_partials))
+        return folded, stats, clean_rows
+
+    def ingest_incremental(self, file_pattern, value_cols, master_path, pincode_path,
+                           cache_dir=SHARD_CACHE_DIR, chunksize=STREAM_CHUNK_SIZE):
+        """
+        Incremental Mode: cleans only the shards the manifest has not seen
+        (or whose content changed) and updates the master at `master_path`
+        and the pincode totals at `pincode_path`.
+        Returns the rewritten master rows, or None if nothing changed.
+
+        Each shard's normalized rows stay cached as a spill (see SPILL_DIR)
+        and every month's merged partials are cached under MERGED_DIR. Only
+        months that new, changed or removed shards touch are merged again,
+        from the spills of the shards holding that month, and only master
+        partitions from the earliest touched month on are rewritten. The
+        dense master gives every district every day, so a change in the
+        district set (or in which district appeared first) rewrites it all.
+        Pincode totals are re-folded from the monthly partials.
+        """
+        cache_dir = os.path.join(cache_dir, self.dataset_name.lower())
+        merged_dir = os.path.join(cache_dir, MERGED_DIR)
+        os.makedirs(merged_dir, exist_ok=True)
+        manifest = ShardManifest(os.path.join(cache_dir, 'manifest.json'))
+        state_path = os.path.join(merged_dir, 'state.json')
+        merged = {'months': {}}
+        if os.path.exists(state_path):
+            with open(state_path) as fh:
+                merged = json.load(fh)
+
+        files = sorted(glob.glob(file_pattern))
+        new, changed, removed, prints = manifest.diff(files)
+
+        def spill_path(entry):
+            return os.path.join(cache_dir, entry['sha256'])
+
+        def merged_path(month, kind):
+            return os.path.join(merged_dir, f"{month}.{kind}.parquet")
+
+        # Shards cached before per-month spills existed are cleaned again
+        changed += [f for f in files if f not in new and f not in changed
+                    and ('months' not in manifest.entries[f] or not os.path.isdir(spill_path(prints[f])))]
+        print(f"[{self.dataset_name}] Shards: {len(new)} new, {len(changed)} changed, "
+              f"{len(removed)} removed, {len(files) - len(new) - len(changed)} unchanged")
+        master_exists = os.path.isdir(master_path) and os.path.isdir(pincode_path)
+        resume = master_exists and os.path.exists(state_path)
+        if resume and not (new or changed or removed):
+            return None
+
+        stale = [manifest.entries[f] for f in changed + removed]
+        affected = {m for entry in stale for m in entry.get('months', {})}
+        for f in removed:
+            del manifest.entries[f]
+        for f in new + changed:
+            spill_dir = spill_path(prints[f])
+            if os.path.isdir(spill_dir):
+                shutil.rmtree(spill_dir)
+            os.makedirs(spill_dir)
+            _, shard_stats, shard_raw, months = self._spill_files([f], value_cols, chunksize, spill_dir)
+            manifest.entries[f] = {**prints[f], 'rows': shard_raw, 'drops': dict(shard_stats),
+                                   'months': {_month_label(m): n for m, n in sorted(months.items())}}
+            affected.update(manifest.entries[f]['months'])
+        if not manifest.entries:
+            return None
+
+        # Identical shards share one spill
+        live = {e['sha256']: e for e in manifest.entries.values()}
+        if not resume:
+            # First run, or a cache from before monthly merges: merge everything
+            affected |= {m for entry in live.values() for m in entry['months']}
+            merged = {'months': {}}
+        old_months = dict(merged['months'])
+        old_first = self._first_seen(merged_path, old_months)
+
+        with step('merge_spills', dataset=self.dataset_name, months=len(affected)) as s:
+            s.rows_in = s.rows_out = 0
+            for month in sorted(affected):
+                holders = sorted(sha for sha, entry in live.items() if month in entry['months'])
+                rows = sum(live[sha]['months'][month] for sha in holders)
+                if not rows:
+                    merged['months'].pop(month, None)
+                    for kind in ('district', 'pincode', 'first'):
+                        if os.path.exists(merged_path(month, kind)):
+                            os.remove(merged_path(month, kind))
+                    continue
+                spills = [f for sha in holders for f in sorted(glob.glob(os.path.join(cache_dir, sha, 'part-*.parquet')))]
+                code = int(month.replace('-', ''))
+                (partial, pincodes), month_stats, clean_rows = self._merge_month(spills, value_cols, code, rows)
+                partial.to_parquet(merged_path(month, 'district'))
+                pincodes.to_parquet(merged_path(month, 'pincode'))
+                days = partial.index.get_level_values('date')
+                first = pd.Series(days, index=partial.index.droplevel('date')).groupby(level=[0, 1]).min()
+                first.rename('date').to_frame().to_parquet(merged_path(month, 'first'))
+                merged['months'][month] = {'rows': clean_rows, 'drops': dict(month_stats),
+                                           'first': str(days.min().date()) if clean_rows else None,
+                                           'last': str(days.max().date()) if clean_rows else None}
+                s.rows_in += rows
+                s.rows_out += clean_rows
+                s.drops.update(month_stats)
+
+        stats = Counter()
+        for entry in live.values():
+            stats.update(entry.get('drops', {}))
+        for month in merged['months'].values():
+            stats.update(month['drops'])
+        raw_rows = sum(entry.get('rows', 0) for entry in live.values())
+        clean_rows = sum(month['rows'] for month in merged['months'].values())
+        self._report(stats, raw_rows, clean_rows, len(value_cols) + 4)
+
+        months = sorted(merged['months'])
+        with step('merge_masters', dataset=self.dataset_name, months=len(affected)) as s:
+            pincode_parts = [pd.read_parquet(merged_path(m, 'pincode')) for m in months]
+            if pincode_parts:
+                write_store(compact_counts(self._fold_partials(pincode_parts).reset_index(), value_cols), pincode_path)
+
+            first_seen = self._first_seen(merged_path, merged['months'])
+            dated = [m for m in months if merged['months'][m]['first']]
+            span = (pd.Timestamp(min(merged['months'][m]['first'] for m in dated)),
+                    pd.Timestamp(max(merged['months'][m]['last'] for m in dated))) if dated else None
+            old_dated = [m for m in old_months if old_months[m]['first']]
+            old_span = (pd.Timestamp(min(old_months[m]['first'] for m in old_dated)),
+                        pd.Timestamp(max(old_months[m]['last'] for m in old_dated))) if old_dated else None
+
+            # Rewrite from the earliest touched month (or moved end of the timeline)
+            full = not resume or not months or (not IMPLICIT_ZEROS and not old_first.equals(first_seen))
+            start = set(affected)
+            for now, then in zip(span or (), old_span or ()):
+                if now != then:
+                    start.add(min(now, then).strftime('%Y-%m'))
+            rewrite_from = (months[0] if months else '') if full or not start else min(start)
+
+            def build(first_month):
+                parts = [pd.read_parquet(merged_path(m, 'district')) for m in months if m >= first_month]
+                combined = self._fold_partials(parts).reset_index() if parts else \
+                    pd.DataFrame(columns=DISTRICT_KEYS + value_cols)
+                combined = combined[combined[value_cols].sum(axis=1) > 0] if IMPLICIT_ZEROS else combined
+                if span is None or span[1] < pd.Timestamp(first_month + '-01'):
+                    return combined[DISTRICT_KEYS + value_cols].iloc[:0]
+                dates = pd.date_range(max(span[0], pd.Timestamp(first_month + '-01')), span[1], freq='D')
+                return compact_counts(self.create_master_continuity(
+                    combined, value_cols, first_seen=first_seen, dates=dates), value_cols)
+
+            master = build(rewrite_from)
+            fitted = None if full else self._fit_store_dtypes(master, master_path, value_cols)
+            if fitted is not None:
+                replace_months(fitted, master_path, rewrite_from)
+            else:
+                if not full:
+                    # Counts outgrew the store's column types: rewrite it all
+                    master = build(months[0])
+                write_store(master, master_path)
+            s.rows_out = len(master)
+
+        with open(f"{state_path}.tmp", 'w') as fh:
+            json.dump(merged, fh, indent=1, sort_keys=True)
+        os.replace(f"{state_path}.tmp", state_path)
+        manifest.save()
+
+        for entry in stale:
+            if entry['sha256'] not in live:
+                shutil.rmtree(spill_path(entry), ignore_errors=True)
+            # Partials cached by earlier versions
+            for legacy in glob.glob(os.path.join(cache_dir, f"{entry['sha256']}*.parquet")):
+                os.remove(legacy)
+        return master
+
+    @staticmethod
+    def _first_seen(merged_path, months):
+        """First date of every (state, district) over the merged `months`."""
+        parts = [pd.read_parquet(merged_path(m, 'first'))['date'] for m in sorted(months) if months[m]['first']]
+        if not parts:
+            return pd.Series(dtype='datetime64[ns]', name='date')
+        return pd.concat(parts).groupby(level=[0, 1]).min()
+
+    @staticmethod
+    def _fit_store_dtypes(frame, path, value_cols):
+        """
+        `frame` cast to the value column types of the store at `path`, or
+        None when a column needs a wider type than the store has.
+        """
+        dtypes = store_dtypes(path, value_cols)
+        for col in value_cols:
+            if frame[col].dtype != dtypes[col]:
+                if not np.can_cast(frame[col].dtype, dtypes[col]):
+                    return None
+                frame = frame.astype({col: dtypes[col]})
+        return frame
+
+    @staticmethod
+    def _fold_partials(partials):
+        """Merges indexed partial sums (district or pincode level) into one."""
+        return pd.concat(partials).groupby(level=list(range(partials[0].index.nlevels))).sum()
+
     def clean_pipeline(self, df, value_cols):
         """Executes Steps 1, 2, 3, 4, 5, 7"""
         initial_rows = len(df)
-        
+        with step('clean_pipeline', rows_in=initial_rows, dataset=self.dataset_name) as s:
+            df, stats = self._clean_chunk(df, value_cols)
+            s.rows_out = len(df)
+            s.drops.update(stats)
+        self._report(stats, initial_rows, len(df), df.shape[1])
+        return df
+
+    def _report(self, stats, initial_rows, final_rows, n_cols):
+        if stats['invalid_pincode'] > 0:
+            print(f"[{self.dataset_name}] ⚠️ Dropped {stats['invalid_pincode']} rows with invalid Pincodes.")
+        print(f"[{self.dataset_name}] ♻️ Removed {stats['duplicate']} duplicate rows.")
+        print(f"[{self.dataset_name}] Final Clean Shape: {(final_rows, n_cols)} (Removed {initial_rows - final_rows} bad rows)")
+
+    def _clean_chunk(self, df, value_cols, dedup=True):
+        """
+        Fused cleaning kernel: Steps 1, 2, 3, 4, 5, 7 in a single pass.
+        Every check only builds a row mask; the output is materialized once.
+        String and date work runs over distinct values, not rows.
+        Returns the clean frame and its per-reason drop counts.
+        With dedup=False only Steps 1-4 run (streaming mode deduplicates
+        across chunks later, see _merge_spills).
+        """
+        stats = Counter()
+
         # --- Step 1: Garbage Row Removal ---
-        # Drop rows where critical metadata is missing
-        df = df.dropna(subset=['date', 'state', 'district', 'pincode'])
+        # Rows where critical metadata is missing
+        bad = df[['date', 'state', 'district', 'pincode']].isna().any(axis=1).to_numpy()
+        stats['missing_metadata'] = int(bad.sum())
         
         # --- Step 2: Location Normalization ---
-        # Strip whitespace and Lowercase for mapping
-        df['state'] = df['state'].str.strip().str.lower()
-        df['state'] = df['state'].replace(STATE_MAPPING)
-        # Title Case for final presentation
-        df['state'] = df['state'].str.title() 
-        df['district'] = df['district'].str.strip().str.title()
+        # Strip, Lowercase for mapping, then Title Case for final presentation
+        state = _map_unique(df['state'], lambda u: u.str.strip().str.lower().replace(STATE_MAPPING).str.title())
+        district = _map_unique(df['district'], lambda u: u.str.strip().str.title())
         
         # Parse Dates (Invalid dates become NaT and are dropped)
-        df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y', errors='coerce')
-        df = df.dropna(subset=['date'])
+        date = _map_unique(df['date'], lambda u: pd.to_datetime(u, format='%d-%m-%Y', errors='coerce'), fill=np.datetime64('NaT'))
+        invalid = ~bad & np.isnat(date)
+        stats['invalid_date'] = int(invalid.sum())
+        bad |= invalid
         
         # --- Step 3: Pincode Validation ---
         # Regex: Exactly 6 digits
-        valid_pincode_mask = df['pincode'].str.match(r'^\d{6}$')
-        invalid_count = (~valid_pincode_mask).sum()
-        df = df[valid_pincode_mask]
-        if invalid_count > 0:
-            print(f"[{self.dataset_name}] ⚠️ Dropped {invalid_count} rows with invalid Pincodes.")
+        valid_pincode = _map_unique(df['pincode'], lambda u: u.str.match(r'^\d{6}$'), fill=False).astype(bool)
+        invalid = ~bad & ~valid_pincode
+        stats['invalid_pincode'] = int(invalid.sum())
+        bad |= invalid
+        pincode = np.where(bad, '0', df['pincode'].to_numpy()).astype(PINCODE_DTYPE)
             
         # --- Step 4: Missing Value Treatment ---
         # Fill metric columns with 0
-        df[value_cols] = df[value_cols].fillna(0)
-        
+        columns = {col: df[col].to_numpy() for col in df.columns}
+        columns.update(date=date, state=state, district=district, pincode=pincode)
+        for col in value_cols:
+            columns[col] = df[col].fillna(0).to_numpy()
+
+        alive = np.flatnonzero(~bad)
+        rows = pd.DataFrame({col: values[alive] for col, values in columns.items()}, index=df.index[alive])
+        if not dedup:
+            return rows, stats
+        clean, finish_stats = self._drop_duplicates_and_negatives(rows, value_cols)
+        stats.update(finish_stats)
+        return clean, stats
+
+    @staticmethod
+    def _drop_duplicates_and_negatives(rows, value_cols):
+        """Steps 5 and 7 on normalized rows; returns the clean rows and drop counts."""
+        stats = Counter()
+
         # --- Step 5: Deduplication ---
-        # Remove exact duplicates
-        before_dedup = len(df)
-        df = df.drop_duplicates()
-        print(f"[{self.dataset_name}] ♻️ Removed {before_dedup - len(df)} duplicate rows.")
+        # Exact duplicates among the surviving rows
+        dup = rows.duplicated().to_numpy()
+        stats['duplicate'] = int(dup.sum())
+        rows = rows[~dup]
         
         # --- Step 7: Feature Validity Guarantee ---
         # Ensure metrics are non-negative
-        for col in value_cols:
-            df = df[df[col] >= 0]
-            
-        print(f"[{self.dataset_name}] Final Clean Shape: {df.shape} (Removed {initial_rows - len(df)} bad rows)")
-        return df
+        negative = (rows[value_cols] < 0).any(axis=1).to_numpy()
+        stats['negative_value'] = int(negative.sum())
+        return rows[~negative], stats
 
-    def create_master_continuity(self, df, value_cols):
+    def create_master_continuity(self, df, value_cols, implicit_zeros=IMPLICIT_ZEROS, first_seen=None, dates=None):
         """
         Creates the 'Resilience Master' (District Level)
         Aggregates Pincodes -> Districts and Imputes Missing Dates (0s)
+        With implicit_zeros=True the sparse district series is returned as-is:
+        every day between the first and last date that has no row is a 0.
+        When `df` holds only part of the feed, `first_seen` (first date of
+        every (state, district) in the feed) and `dates` give the districts
+        and days of that part of the full master.
         """
-        # Aggregate to District Level
-        df_dist = df.groupby(['date', 'state', 'district'])[value_cols].sum().reset_index()
-        
-        # Time-Series Imputation (The 'Skeleton' method)
-        min_date = df_dist['date'].min()
-        max_date = df_dist['date'].max()
-        all_dates = pd.date_range(min_date, max_date, freq='D')
-        
-        unique_districts = df_dist[['state', 'district']].drop_duplicates()
+        with step('create_master_continuity', rows_in=len(df), dataset=self.dataset_name) as s:
+            # Aggregate to District Level
+            df_dist = df.groupby(['state', 'district', 'date'])[value_cols].sum()
         
-        # Cartesian Product (All Dates x All Districts)
-        # This guarantees NO gaps in the timeline
-        idx = pd.MultiIndex.from_product(
-            [all_dates, unique_districts['state'].unique()], 
-            names=['date', 'state']
-        )
-        # Note: This simple product assumes all states have all districts, which is wrong.
-        # Correct approach: Iterate unique State-District pairs
+            # Time-Series Imputation (The 'Skeleton' method)
+            days = df_dist.index.get_level_values('date')
+            all_dates = pd.date_range(days.min(), days.max(), freq='D') if dates is None else dates
         
-        skeleton_list = []
-        for _, row in unique_districts.iterrows():
-            # Create a dataframe for this specific district for all dates
-            temp = pd.DataFrame({'date': all_dates})
-            temp['state'] = row['state']
-            temp['district'] = row['district']
-            skeleton_list.append(temp)
-            
-        skeleton_df = pd.concat(skeleton_list, ignore_index=True)
+            if implicit_zeros:
+                # Consumers derive the same date range from min/max of the data
+                final_df = df_dist.reset_index()[DISTRICT_KEYS + value_cols]
+                final_df.attrs['date_range'] = (all_dates[0], all_dates[-1])
+                s.rows_out = len(final_df)
+                return final_df
         
-        # Merge Data
-        final_df = pd.merge(skeleton_df, df_dist, on=['date', 'state', 'district'], how='left')
-        final_df[value_cols] = final_df[value_cols].fillna(0)
+            # Full (District x Date) index in one shot, then a single reindex
+            # This guarantees NO gaps in the timeline
+            # Districts ordered by first active date, like the old per-district loop
+            if first_seen is None:
+                first_seen = pd.Series(days, index=df_dist.index.droplevel('date')).groupby(level=[0, 1]).min()
+            districts = first_seen.index[np.lexsort((
+                first_seen.index.get_level_values('district'),
+                first_seen.index.get_level_values('state'),
+                first_seen.to_numpy(),
+            ))]
+            n_dates = len(all_dates)
+            full_idx = pd.MultiIndex.from_arrays(
+                [
+                    np.repeat(districts.get_level_values('state'), n_dates),
+                    np.repeat(districts.get_level_values('district'), n_dates),
+                    np.tile(all_dates, len(districts)),
+                ],
+                names=['state', 'district', 'date']
+            )
+            final_df = df_dist.reindex(full_idx, fill_value=0).reset_index()
+            s.rows_out = len(final_df)
         
-        return final_df
+            return final_df[DISTRICT_KEYS + value_cols]
 
 # ==========================================
 # EXECUTION
 # ==========================================
 
-# 1. BIOMETRIC
-bio_refinery = AadhaarDataRefinery("Biometric")
-bio_raw = bio_refinery.load_shards('api_data_aadhar_biometric_*.csv')
-bio_cols = ['bio_age_5_17', 'bio_age_17_']
-if not bio_raw.empty:
-    bio_clean = bio_refinery.clean_pipeline(bio_raw, bio_cols)
-    bio_master = bio_refinery.create_master_continuity(bio_clean, bio_cols)
-    bio_master.to_csv('cleaned_master_biometric.csv', index=False)
-
-# 2. DEMOGRAPHIC
-demo_refinery = AadhaarDataRefinery("Demographic")
-demo_raw = demo_refinery.load_shards('api_data_aadhar_demographic_*.csv')
-demo_cols = ['demo_age_5_17', 'demo_age_17_']
-if not demo_raw.empty:
-    demo_clean = demo_refinery.clean_pipeline(demo_raw, demo_cols)
-    demo_master = demo_refinery.create_master_continuity(demo_clean, demo_cols)
-    demo_master.to_csv('cleaned_master_demographic.csv', index=False)
-
-# 3. ENROLMENT
-enrol_refinery = AadhaarDataRefinery("Enrolment")
-enrol_raw = enrol_refinery.load_shards('api_data_aadhar_enrolment_*.csv')
-enrol_cols = ['age_0_5', 'age_5_17', 'age_18_greater']
-if not enrol_raw.empty:
-    enrol_clean = enrol_refinery.clean_pipeline(enrol_raw, enrol_cols)
-    enrol_master = enrol_refinery.create_master_continuity(enrol_clean, enrol_cols)
-    enrol_master.to_csv('cleaned_master_enrolment.csv', index=False)
-
-print("\nProcessing Complete. Master files generated.")
\ No newline at end of file
+TASKS = {
+    'biometric': ("Biometric", 'api_data_aadhar_biometric_*.csv', ['bio_age_5_17', 'bio_age_17_']),
+    'demographic': ("Demographic", 'api_data_aadhar_demographic_*.csv', ['demo_age_5_17', 'demo_age_17_']),
+    'enrolment': ("Enrolment", 'api_data_aadhar_enrolment_*.csv', ['age_0_5', 'age_5_17', 'age_18_greater'])
+}
+
+def refine_dataset(name):
+    """Phase 1 for one dataset: raw shards -> cleaned_master_<name> and cleaned_pincodes_<name>."""
+    label, pattern, cols = TASKS[name]
+    refinery = AadhaarDataRefinery(label)
+    if INCREMENTAL:
+        # Manifest-driven: only new/changed shards are cleaned and merged
+        refinery.ingest_incremental(pattern, cols, f'cleaned_master_{name}', f'cleaned_pincodes_{name}')
+        return
+    if STREAM_CHUNK_SIZE:
+        # Streaming: clean chunk by chunk into district and pincode partials
+        clean, pincodes = refinery.stream_pipeline(pattern, cols)
+    else:
+        raw = refinery.load_shards(pattern)
+        clean = refinery.clean_pipeline(raw, cols) if not raw.empty else pd.DataFrame()
+        pincodes = clean.groupby(PINCODE_KEYS)[cols].sum().reset_index() if not clean.empty else clean
+    if not clean.empty:
+        master = refinery.create_master_continuity(clean, cols)
+        write_store(compact_counts(master, cols), f'cleaned_master_{name}')
+        # Pincode totals feed SEC, so the raw shards are cleaned only once
+        write_store(compact_counts(pincodes, cols), f'cleaned_pincodes_{name}')
+
+if __name__ == "__main__":
+    # Per-step timings, memory and drop counts (see telemetry.py)
+    start_run('preprocessing')
+    try:
+        for name in TASKS:
+            refine_dataset(name)
+
+        print("\nProcessing Complete. Master files generated.")
+    finally:
+        # Failed runs keep their steps (status names the exception)
+        save_report()
@@ -0,0 +1,85 @@
+import os
+
+from lazy_imports import lazy_import
+from pillar_weights import PILLAR_WEIGHTS
+
+pd = lazy_import('pandas')
+
+# ==========================================
+# HIERARCHICAL ROLLUP CUBE
+# ==========================================
+# Counts, volume sums and score summaries precomputed at every level of
+#   national > state > district > pincode
+# with one row per (level, state, district, pincode) key. A level leaves
+# the key parts below it empty (''). The index is sorted, so a card value
+# or a drill-down is an index lookup, not a scan of the dashboard:
+#
+#   cube = load_cube()
+#   cube.loc[cube_key('state', 'Bihar'), 'SAMARTH_Score']   # mean over districts
+#   cube.loc[('pincode', 'Bihar', 'Patna')]                 # the district's pincodes
+
+CUBE_PATH = 'rollup_cube.parquet'
+LEVELS = ('national', 'state', 'district', 'pincode')
+KEY_COLS = ['level', 'state', 'district', 'pincode']
+SCORE_COLS = ['MBCI_Score', 'ALV_Score', 'SEC_Score', 'SAMARTH_Score']
+
+
+def cube_key(level, state='', district='', pincode=''):
+    """Index key of one cube row."""
+    return (level, state, district, str(pincode))
+
+
+def build_rollup_cube(dashboard, pincodes):
+    """
+    `dashboard`: one row per district with 'state', 'district', the pillar
+    scores and its update ('bio_age_5_17') and enrolment ('age_5_17') totals.
+    `pincodes`: 'state', 'district', 'pincode', 'updates', 'enrolments'.
+    Returns the cube (scores are district means, NaN at pincode level).
+    """
+    pins = pincodes[['state', 'district', 'pincode', 'updates', 'enrolments']].copy()
+    pins['pincode'] = pins['pincode'].astype(str)
+    per_district = pins.groupby(['state', 'district']).size().rename('n_pincodes')
+
+    districts = dashboard.rename(columns={'bio_age_5_17': 'updates', 'age_5_17': 'enrolments'})
+    w_mbci, w_alv, w_sec = PILLAR_WEIGHTS
+    districts = districts.assign(SAMARTH_Score=w_mbci * districts['MBCI_Score']
+                                 + w_alv * (100 - districts['ALV_Score'])
+                                 + w_sec * districts['SEC_Score'])
+    districts = districts.join(per_district, on=['state', 'district'])
+    districts['n_pincodes'] = districts['n_pincodes'].fillna(0).astype('int64')
+    districts['n_districts'] = 1
+
+    # Higher levels are sums of the district rows (scores: mean, min, max)
+    agg = {
+        'n_districts': ('n_districts', 'sum'),
+        'n_pincodes': ('n_pincodes', 'sum'),
+        'updates': ('updates', 'sum'),
+        'enrolments': ('enrolments', 'sum'),
+        **{c: (c, 'mean') for c in SCORE_COLS},
+        'SAMARTH_Min': ('SAMARTH_Score', 'min'),
+        'SAMARTH_Max': ('SAMARTH_Score', 'max'),
+    }
+    national = districts.assign(level='national').groupby('level').agg(**agg).reset_index()
+    states = districts.groupby('state').agg(**agg).reset_index().assign(level='state')
+    districts = districts.assign(level='district', SAMARTH_Min=districts['SAMARTH_Score'],
+                                 SAMARTH_Max=districts['SAMARTH_Score'])
+    pins = pins.assign(level='pincode', n_districts=1, n_pincodes=1)
+
+    cube = pd.concat([national, states, districts[list(agg) + ['level', 'state', 'district']], pins],
+                     ignore_index=True)
+    cube[KEY_COLS] = cube[KEY_COLS].fillna('')
+    cube['Raw_Ratio'] = cube['updates'] / (cube['enrolments'] + 1)
+    return cube.set_index(KEY_COLS).sort_index()
+
+
+def write_cube(cube, path=CUBE_PATH):
+    tmp = f"{path}.tmp"
+    cube.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+def load_cube(path=CUBE_PATH):
+    """The cube with its sorted (level, state, district, pincode) index; None if missing."""
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path).sort_index()
@@ -0,0 +1,71 @@
+import importlib
+
+# ==========================================
+# SAMARTH LIBRARY (Lazy Public API)
+# ==========================================
+# The pipeline modules as one importable namespace. Names resolve on first
+# use, so `import samarth` loads nothing heavy and
+# `from samarth import sec_scores` imports only calculate_metrics (pandas
+# and numpy wait until the function runs, see lazy_imports.py).
+#
+#   python -m samarth [stages] [--force ...]   # the pipeline runner
+#
+# The modules behind these names are top-level modules (preprocessing,
+# calculate_metrics, ...), not submodules: `pip install .` installs them
+# next to this package; a checkout needs the repo root on sys.path.
+
+_EXPORTS = {
+    # Cleaning
+    'get_clean_state': 'cleaning_engines',
+    'StateCanonicalizer': 'cleaning_engines',
+    'clean_districts_in_state': 'cleaning_engines',
+    'district_cluster_map': 'cleaning_engines',
+    'AadhaarDataRefinery': 'preprocessing',
+    'refine_dataset': 'preprocessing',
+    'process_dataset': 'final_clean',
+    'apply_aliases': 'final_clean',
+    'finalize_dataset': 'final_clean',
+    # Scoring
+    'MetricEngine': 'metric_engine',
+    'std_with_zeros': 'metric_engine',
+    'pillar_accumulators': 'calculate_metrics',
+    'calculate_batch_dumps': 'calculate_metrics',
+    'calculate_mbci_alv_realistic': 'calculate_metrics',
+    'detect_batch_dumps': 'spike_detector',
+    'calculate_sec_realistic': 'calculate_metrics',
+    'gini_by_group': 'calculate_metrics',
+    'sec_scores': 'calculate_metrics',
+    'calculate_pillar_trends': 'calculate_metrics',
+    'calculate_confidence_bands': 'calculate_metrics',
+    'build_dashboard': 'calculate_metrics',
+    # Stores
+    'load_frame': 'columnar_store',
+    'iter_frames': 'columnar_store',
+    'write_store': 'columnar_store',
+    'LocationRegistry': 'location_registry',
+    'build_rollup_cube': 'rollup_cube',
+    'load_cube': 'rollup_cube',
+    'cube_key': 'rollup_cube',
+    'WhatIfSimulator': 'simulator',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'samarth' has no attribute {name!r}")
+    try:
+        module = importlib.import_module(_EXPORTS[name])
+    except ModuleNotFoundError as exc:
+        if exc.name != _EXPORTS[name]:
+            raise
+        raise ImportError(f"samarth.{name} needs the top-level module '{exc.name}': install the "
+                          f"project (pip install .) or put the repo root on sys.path") from exc
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
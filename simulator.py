@@ -0,0 +1,143 @@
+from functools import lru_cache
+
+from lazy_imports import lazy_import
+from pillar_weights import ALV_BURST_WEIGHT, PILLAR_WEIGHTS
+
+np = lazy_import('numpy')
+
+# ==========================================
+# WHAT-IF SIMULATOR ENGINE
+# ==========================================
+# The dashboard's base pillar scores are held once, as one (districts, 3)
+# array of NEEV, GATI and NYAY. A scenario (slider deltas + state view) is
+# a single add-clip-weight over that array, and the last SIM_CACHE_SIZE
+# scenarios are kept, so dragging a slider back and forth is a cache hit:
+#
+#   sim = WhatIfSimulator(dashboard)
+#   df_view = sim.scenario(5, 0, 10, 'Bihar')   # NEEV +5, NYAY +10, Bihar only
+#   df_view = sim.scenario(5, 0, 0, 'Bihar', rank_aware=True)
+
+SIM_CACHE_SIZE = 64
+ALL_STATES = "All India"
+
+# Rank-aware mode: interventions reach the view's districts scoring below
+# SIM_TARGET_SCORE on that pillar. Each slider step of camps lifts their
+# biometric updates (so their update/enrolment ratio) by CAMP_LIFT, and each
+# step of sync protocols cuts their daily volatility and burst by SYNC_CUT.
+# MBCI is then re-ranked and ALV re-scaled across all districts, as
+# calculate_metrics.py does; vans add NYAY points as in the flat mode.
+SIM_TARGET_SCORE = 50
+CAMP_LIFT = 0.05
+SYNC_CUT = 0.04
+
+
+def _mid_ranks(less, leq):
+    """Average (tie-aware) 1-based rank from the counts of values < and <= x."""
+    return less + (leq - less + 1) / 2
+
+
+class WhatIfSimulator:
+    """Cached scenarios over the dashboard's base scores (frames are shared: do not modify them)."""
+    def __init__(self, dashboard, cache_size=SIM_CACHE_SIZE):
+        self.frame = dashboard.reset_index(drop=True)
+        self.base = np.column_stack([
+            self.frame['MBCI_Score'].to_numpy('float64'),
+            100 - self.frame['ALV_Score'].to_numpy('float64'),
+            self.frame['SEC_Score'].to_numpy('float64'),
+        ])
+        self.weights = np.asarray(PILLAR_WEIGHTS)
+        self.state_rows = {s: rows for s, rows in self.frame.groupby('state').indices.items()}
+        self.states = sorted(self.state_rows)
+        self._index_base()
+        self.scenario = lru_cache(maxsize=cache_size)(self._scenario)
+
+    def _index_base(self):
+        """Sorted ratio index and volatility order for rank-aware re-scoring."""
+        frame = self.frame
+        self.ratio = frame['Raw_Ratio'].to_numpy('float64')
+        self.ratio_order = np.argsort(self.ratio, kind='stable')
+        self.ratio_sorted = self.ratio[self.ratio_order]
+        self.ratio_less = np.searchsorted(self.ratio_sorted, self.ratio, 'left')
+        self.ratio_leq = np.searchsorted(self.ratio_sorted, self.ratio, 'right')
+
+        # Dashboards built before spike detection have a volatility-only ALV
+        self.burst_weight = ALV_BURST_WEIGHT if 'Burst_Score' in frame.columns else 0.0
+        self.burst = frame['Burst_Score'].to_numpy('float64') if self.burst_weight else np.zeros(len(frame))
+        self.std = frame['Load_Volatility_StdDev'].to_numpy('float64')
+        self.std_order = np.argsort(-self.std, kind='stable')
+        # ALV was scaled by the largest std of every district with uploads,
+        # which may have no dashboard row (no enrolments): recover it
+        volatility = (frame['ALV_Score'].to_numpy('float64') - self.burst_weight * self.burst) / (1 - self.burst_weight)
+        top = self.std_order[0] if len(frame) else None
+        self.outside_max = 0.0
+        if top is not None and volatility[top] > 0:
+            scale = self.std[top] * 100 / volatility[top]
+            self.outside_max = scale if not np.isclose(scale, self.std[top]) else 0.0
+
+    def scores(self, neev=0, gati=0, nyay=0, rows=None):
+        """(NEEV, GATI, NYAY) after the interventions, capped at 100, and SAMARTH."""
+        base = self.base if rows is None else self.base[rows]
+        pillars = np.minimum(base + np.array([neev, gati, nyay], dtype='float64'), 100)
+        return pillars, pillars @ self.weights
+
+    def reranked_mbci(self, targets, lift):
+        """
+        MBCI of every district after multiplying the `targets` ratios by `lift`.
+        Only the moved ratios are sorted. A district's rank changes only if
+        its ratio lies between the lowest and highest moved value; those
+        ranks are corrected by binary searches (how many moved values now
+        fall below it, and how many used to) instead of re-ranking everyone.
+        """
+        moved = self.ratio[targets] * lift
+        less, leq = self.ratio_less.copy(), self.ratio_leq.copy()
+        if len(moved):
+            old, new = np.sort(self.ratio[targets]), np.sort(moved)
+
+            def counts(x, side, base):
+                return base - np.searchsorted(old, x, side) + np.searchsorted(new, x, side)
+
+            lo, hi = min(old[0], new[0]), max(old[-1], new[-1])
+            window = self.ratio_order[np.searchsorted(self.ratio_sorted, lo, 'left'):
+                                      np.searchsorted(self.ratio_sorted, hi, 'right')]
+            less[window] = counts(self.ratio[window], 'left', less[window])
+            leq[window] = counts(self.ratio[window], 'right', leq[window])
+            less[targets] = counts(moved, 'left', np.searchsorted(self.ratio_sorted, moved, 'left'))
+            leq[targets] = counts(moved, 'right', np.searchsorted(self.ratio_sorted, moved, 'right'))
+        return _mid_ranks(less, leq) / len(self.ratio) * 100
+
+    def rescaled_alv(self, targets, cut):
+        """ALV of every district after cutting the `targets` volatility and burst by `cut`."""
+        std = np.where(targets, self.std * (1 - cut), self.std)
+        burst = np.where(targets, self.burst * (1 - cut), self.burst)
+        # New maximum: the largest untouched std (first in the sorted order) or a moved one
+        untouched = self.std_order[~targets[self.std_order]]
+        max_std = max(self.outside_max, self.std[untouched[0]] if len(untouched) else 0.0,
+                      std[targets].max() if targets.any() else 0.0)
+        volatility = std / max_std * 100 if max_std > 0 else np.zeros_like(std)
+        return (1 - self.burst_weight) * volatility + self.burst_weight * burst
+
+    def rank_aware_scores(self, neev=0, gati=0, nyay=0, rows=None):
+        """Like scores(), but interventions move the underlying ratio and volatility (see header)."""
+        in_view = np.zeros(len(self.frame), dtype=bool)
+        in_view[slice(None) if rows is None else rows] = True
+        mbci, gati_score, sec = self.base.T
+
+        if neev:
+            mbci = self.reranked_mbci(in_view & (mbci < SIM_TARGET_SCORE), 1 + neev * CAMP_LIFT)
+        if gati:
+            gati_score = 100 - self.rescaled_alv(in_view & (gati_score < SIM_TARGET_SCORE), min(gati * SYNC_CUT, 1))
+        if nyay:
+            sec = np.where(in_view & (sec < SIM_TARGET_SCORE), np.minimum(sec + nyay, 100), sec)
+
+        pillars = np.column_stack([mbci, gati_score, sec])
+        if rows is not None:
+            pillars = pillars[rows]
+        return pillars, pillars @ self.weights
+
+    def _scenario(self, neev=0, gati=0, nyay=0, state=ALL_STATES, rank_aware=False):
+        rows = None if state == ALL_STATES else self.state_rows.get(state, [])
+        score = self.rank_aware_scores if rank_aware else self.scores
+        pillars, samarth = score(neev, gati, nyay, rows)
+        view = self.frame if rows is None else self.frame.iloc[rows]
+        return view.assign(NEEV_Score=pillars[:, 0], GATI_Score=pillars[:, 1],
+                           NYAY_Score=pillars[:, 2], SAMARTH_Score=samarth)
@@ -0,0 +1,118 @@
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# ==========================================
+# BATCH-DUMP SPIKE DETECTOR (Vectorized)
+# ==========================================
+# The std of daily uploads cannot tell a steady high-volume district from
+# one that hoards enrolments offline and syncs them in a few huge days.
+# This detector flags the sync days themselves, for every district at once,
+# as axis operations on the district x day matrix (see matrix_store.py):
+#
+#   grid = MatrixStore('final_matrix_biometric')
+#   stats, excess = detect_batch_dumps(grid['bio_age_5_17'])
+#
+# A day is a spike when its volume is
+#   * more than SPIKE_MAD_K robust std devs (1.4826 x MAD) above the
+#     district's local baseline (trailing mean, with past spikes capped),
+#   * at least SPIKE_MIN_RATIO times the district's trailing mean day, and
+#   * at least SPIKE_MIN_VOLUME uploads.
+# Every threshold is taken over the SPIKE_BASELINE_DAYS before the day
+# (causal), so a day's flag never changes when later days arrive or the
+# history is cut with --through. The first SPIKE_MIN_HISTORY days have too
+# little history to judge and are never spikes.
+# A hoarding district (zeros, then a dump) has a zero baseline and MAD, so
+# every dump qualifies; a steady district never reaches the mean ratio.
+
+SPIKE_BASELINE_DAYS = 28
+SPIKE_MAD_K = 5.0
+SPIKE_MIN_RATIO = 3.0
+SPIKE_MIN_VOLUME = 10
+SPIKE_MIN_HISTORY = 7
+
+# Days per block of trailing windows sorted at once (bounds memory)
+SPIKE_BLOCK_DAYS = 64
+
+# MAD -> std dev for normally distributed noise
+MAD_SCALE = 1.4826
+
+
+def trailing_mean(matrix, window):
+    """Mean of the previous `window` days (today excluded; fewer at the start, 0 on day 0)."""
+    totals = np.cumsum(np.pad(matrix, ((0, 0), (1, 0))), axis=1)
+    days = np.arange(matrix.shape[1])
+    lo = np.maximum(days - window, 0)
+    counts = days - lo
+    sums = totals[:, days] - totals[:, lo]
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def trailing_median_mad(matrix, window, block_days=SPIKE_BLOCK_DAYS):
+    """
+    Median and MAD of the previous `window` days (today excluded; fewer at
+    the start, NaN on day 0), as two matrices. Windows are sorted a block
+    of days at a time; padding is NaN, which sorts last.
+    """
+    n_rows, n_days = matrix.shape
+    padded = np.pad(matrix, ((0, 0), (window, 0)), constant_values=np.nan)
+    # Window of day t: padded[t:t + window], i.e. days t - window .. t - 1
+    views = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)
+    counts = np.minimum(np.arange(n_days), window)
+    median = np.full(matrix.shape, np.nan)
+    mad = np.full(matrix.shape, np.nan)
+
+    def middle(sorted_windows, valid):
+        def pick(i):
+            return np.take_along_axis(sorted_windows, i[None, :, None], axis=2)[..., 0]
+        return np.where(valid > 0, (pick(np.maximum(valid - 1, 0) // 2) + pick(valid // 2)) / 2, np.nan)
+
+    for start in range(0, n_days, block_days):
+        days = slice(start, min(start + block_days, n_days))
+        windows = np.sort(views[:, days], axis=2)
+        median[:, days] = middle(windows, counts[days])
+        deviation = np.sort(np.abs(windows - median[:, days, None]), axis=2)
+        mad[:, days] = middle(deviation, counts[days])
+    return median, mad
+
+
+def detect_batch_dumps(matrix, baseline_days=SPIKE_BASELINE_DAYS, k=SPIKE_MAD_K,
+                       min_ratio=SPIKE_MIN_RATIO, min_volume=SPIKE_MIN_VOLUME,
+                       min_history=SPIKE_MIN_HISTORY):
+    """
+    Spike days of every row of a (districts, days) volume matrix.
+    Returns (stats, excess):
+      stats  - one row per matrix row: Spike_Days, Spike_Volume_Share (share
+               of volume uploaded on spike days, 0-1) and Burst_Score (share
+               of volume above the local baseline on spike days, 0-100)
+      excess - (districts, days) volume above baseline on spike days, else 0,
+               for windowed burst scores
+    """
+    x = np.asarray(matrix, dtype='float64')
+    if x.shape[1] == 0:
+        zeros = np.zeros(x.shape[0])
+        return pd.DataFrame({'Spike_Days': zeros.astype('int64'), 'Spike_Volume_Share': zeros,
+                             'Burst_Score': zeros}), x
+
+    median, mad = trailing_median_mad(x, baseline_days)
+    scale = MAD_SCALE * mad
+    mean = trailing_mean(x, baseline_days)
+
+    # Past dumps are capped at the typical range of their own day so they
+    # don't lift the baseline (fmin: day 0 has no range and stays as is)
+    baseline = trailing_mean(np.fmin(x, median + k * scale), baseline_days)
+    with np.errstate(invalid='ignore'):
+        spike = (x - baseline > k * scale) & (x >= min_ratio * mean) & (x >= min_volume)
+    spike[:, :min_history] = False
+    excess = np.where(spike, x - baseline, 0.0)
+
+    total = x.sum(axis=1)
+    has_volume = total > 0
+    spike_volume = np.where(spike, x, 0.0).sum(axis=1)
+    stats = pd.DataFrame({
+        'Spike_Days': spike.sum(axis=1),
+        'Spike_Volume_Share': np.divide(spike_volume, total, out=np.zeros_like(total), where=has_volume),
+        'Burst_Score': np.divide(excess.sum(axis=1), total, out=np.zeros_like(total), where=has_volume) * 100,
+    })
+    return stats, excess
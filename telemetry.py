@@ -0,0 +1,181 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Peak RSS comes from getrusage (Unix), else psutil when installed, else
+# steps report no RSS (SAMARTH_TRACE_MEMORY=1 still gives heap peaks)
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ==========================================
+# RUN TELEMETRY (Per-Step Report)
+# ==========================================
+# Every pipeline step runs inside `step(...)`, which records wall time, CPU
+# time, memory, rows in/out and rows dropped by reason. Each script run
+# appends one JSON line per step to REPORT_PATH, so a slow nightly run can
+# be traced to the step that slowed down:
+#
+#   with step('clean_pipeline', rows_in=len(df)) as s:
+#       df, stats = ...
+#       s.rows_out = len(df)
+#       s.drops.update(stats)
+#
+# Steps nest; a record's 'parent' names the step it ran inside.
+
+REPORT_PATH = 'run_report.jsonl'
+
+# cProfile dumps for hot steps, e.g. SAMARTH_PROFILE=process_dataset,scan
+# ('all' = every step). Only the outermost profiled step is profiled.
+PROFILE_STEPS = tuple(filter(None, os.environ.get('SAMARTH_PROFILE', '').split(',')))
+PROFILE_DIR = 'profiles'
+
+# Exact per-step Python heap peaks via tracemalloc (slower). Without it,
+# steps report the process RSS high-water mark and how much it rose.
+TRACE_MEMORY = os.environ.get('SAMARTH_TRACE_MEMORY') == '1'
+
+
+def _maxrss_mb():
+    """Peak RSS of this process in MiB, or None where it cannot be read."""
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux, bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        # Windows keeps the peak working set; elsewhere only the current RSS
+        return getattr(info, 'peak_wset', info.rss) / 2**20
+    return None
+
+
+class StepRecord:
+    """Measurements of one step; rows_out and drops are filled in by the caller."""
+    def __init__(self, name, parent=None, rows_in=None, **fields):
+        self.name = name
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.drops = Counter()
+        self.fields = fields
+        self.metrics = {}
+        self.heap_peak = 0
+
+    def to_dict(self):
+        record = {'step': self.name, 'parent': self.parent, **self.fields,
+                  'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                  'dropped': {k: int(v) for k, v in self.drops.items() if v}}
+        record.update(self.metrics)
+        return record
+
+
+class RunReport:
+    """Collects the step records of one script run."""
+    def __init__(self, script, path=REPORT_PATH, profile=PROFILE_STEPS, trace_memory=TRACE_MEMORY):
+        self.script = script
+        self.path = path
+        self.profile = set(profile)
+        self.trace_memory = trace_memory
+        self.run_id = time.strftime('%Y%m%dT%H%M%S')
+        self.records = []
+        self._stack = []
+        self._profiling = False
+
+    def _wants_profile(self, name):
+        return not self._profiling and ('all' in self.profile or name in self.profile)
+
+    @contextmanager
+    def step(self, name, rows_in=None, **fields):
+        parent = self._stack[-1] if self._stack else None
+        record = StepRecord(name, parent.name if parent else None, rows_in, **fields)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # The parent's peak so far is kept before the child resets it
+            if parent:
+                parent.heap_peak = max(parent.heap_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            heap_start = tracemalloc.get_traced_memory()[0]
+
+        profiler = None
+        if self._wants_profile(name):
+            profiler = cProfile.Profile()
+            self._profiling = True
+            profiler.enable()
+
+        self._stack.append(record)
+        rss_start = _maxrss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        status = 'ok'
+        try:
+            yield record
+        except BaseException as exc:
+            status = type(exc).__name__
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self._stack.pop()
+            if profiler:
+                profiler.disable()
+                self._profiling = False
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                # Numbered, since a step runs once per dataset
+                dump = f"{self.run_id}_{self.script}_{len(self.records):03d}_{name}.prof"
+                profiler.dump_stats(os.path.join(PROFILE_DIR, dump))
+
+            peak = _maxrss_mb()
+            record.metrics = {
+                'status': status, 'wall_s': round(wall, 4), 'cpu_s': round(cpu, 4),
+                'peak_rss_mb': None if peak is None else round(peak, 1),
+                'rss_growth_mb': None if peak is None else round(peak - rss_start, 1),
+            }
+            if self.trace_memory:
+                record.heap_peak = max(record.heap_peak, tracemalloc.get_traced_memory()[1])
+                record.metrics['heap_peak_mb'] = round((record.heap_peak - heap_start) / 2**20, 1)
+                if parent:
+                    parent.heap_peak = max(parent.heap_peak, record.heap_peak)
+            self.records.append(record)
+
+    def save(self):
+        """Appends this run's steps (in completion order) to the report file."""
+        if not self.records:
+            return
+        with open(self.path, 'a') as fh:
+            for record in self.records:
+                fh.write(json.dumps({'run_id': self.run_id, 'script': self.script, **record.to_dict()}, default=str) + '\n')
+        print(f"⏱️  Run report: {len(self.records)} steps appended to {self.path}")
+
+
+# The active report. Library code calls step() without knowing which
+# script is running; until start_run() is called, steps go nowhere.
+_REPORT = None
+
+
+def start_run(script, **kwargs):
+    global _REPORT
+    _REPORT = RunReport(script, **kwargs)
+    return _REPORT
+
+
+@contextmanager
+def step(name, rows_in=None, **fields):
+    """Times `name` in the active run; a no-op record when none is active."""
+    if _REPORT is None:
+        yield StepRecord(name, rows_in=rows_in, **fields)
+        return
+    with _REPORT.step(name, rows_in, **fields) as record:
+        yield record
+
+
+def save_report():
+    if _REPORT is not None:
+        _REPORT.save()